@@ -1,12 +1,58 @@
+import asyncio
+from pathlib import Path
+from pgvector.asyncpg import register_vector
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.services.config import settings
+from app.services.ann_index import (
+    INDEX_NAME,
+    index_matches_settings,
+    rebuild_index,
+    search_params_sql,
+)
+from app.utils.logger import logger
+
+# Schema script shared by the Postgres container init and the data scripts
+INIT_SQL_PATH = Path(__file__).resolve().parent / "init.sql"
 
 # Set up the database URL from the environment variables
 DATABASE_URL = f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOST}/{settings.POSTGRES_DB}"
 
 # Create the async engine
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=settings.DB_ECHO,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    # Statements are prepared server-side once per connection and reused by SQL text
+    connect_args={"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+)
+
+
+async def register_vector_codec(connection):
+    """
+    Exchange vector values with Postgres in pgvector's binary format instead of
+    as decimal text. The vector type only exists once init.sql has run.
+    """
+    try:
+        await register_vector(connection)
+    except ValueError:
+        logger.warning("The vector type is missing; run init.sql to create it.")
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def set_up_connection(dbapi_connection, connection_record):
+    """
+    Register the vector codec and apply the configured ANN search parameters
+    once per pooled connection.
+    """
+    dbapi_connection.run_async(register_vector_codec)
+    dbapi_connection.run_async(lambda conn: conn.execute(search_params_sql()))
+
 
 # Set up the async session factory
 AsyncSessionLocal = sessionmaker(
@@ -21,3 +67,80 @@ async def get_db():
             yield session  # Yield the session as an async generator
         finally:
             await session.close()
+
+
+async def warm_up_pool(connections: int):
+    """
+    Open `connections` pooled connections at once, so the first requests don't
+    pay for connecting, registering the vector codec and setting search
+    parameters.
+    """
+
+    async def open_connection():
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(open_connection() for _ in range(connections)))
+
+
+async def ping_database(timeout: float) -> bool:
+    """
+    Whether the database answers a trivial query within `timeout` seconds.
+    """
+
+    async def ping():
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.wait_for(ping(), timeout=timeout)
+        return True
+    except Exception as e:
+        logger.warning(f"Database ping failed: {e}")
+        return False
+
+
+async def apply_schema(db: AsyncSession):
+    """
+    Run init.sql against the database. Every statement in it is idempotent, so
+    this also upgrades databases that were initialized by an older version.
+    """
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    # Execute through asyncpg directly, which accepts multiple statements at once
+    await raw_connection.driver_connection.execute(INIT_SQL_PATH.read_text())
+    await db.commit()
+    # The vector type may have just been created by the script
+    await register_vector_codec(raw_connection.driver_connection)
+
+    await apply_embedding_dimensions(db)
+    # Follow changes of VECTOR_INDEX_TYPE and VECTOR_PRECISION
+    if not await index_matches_settings(db):
+        await rebuild_index(db)
+    # End the transaction the checks opened, so callers start from a clean
+    # connection (transactions they open on it must not become savepoints)
+    await db.commit()
+
+
+async def apply_embedding_dimensions(db: AsyncSession):
+    """
+    Resize faqs.embedding to EMBEDDING_DIMENSIONS. Embeddings of another size
+    can't be kept, so they are cleared and re-embedded by initialize_embeddings.py.
+    """
+    result = await db.execute(
+        text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = 'faqs'::regclass AND attname = 'embedding'"
+        )
+    )
+    column_type = result.scalar_one()
+    expected = f"vector({int(settings.EMBEDDING_DIMENSIONS)})"
+    if column_type == expected:
+        return
+
+    logger.info(f"Changing faqs.embedding from {column_type} to {expected}.")
+    await db.execute(text(f"DROP INDEX IF EXISTS {INDEX_NAME}"))
+    await db.execute(
+        text(f"ALTER TABLE faqs ALTER COLUMN embedding TYPE {expected} USING NULL")
+    )
+    await db.commit()
@@ -6,7 +6,94 @@ CREATE TABLE IF NOT EXISTS faqs (
     id SERIAL PRIMARY KEY,
     question TEXT NOT NULL,
     answer TEXT NOT NULL,
-    -- assuming we use a pgvector with a dimension of 1536 as maximum
-    embedding vector(1536)
+    -- created for text-embedding-3-small; resized to EMBEDDING_DIMENSIONS by the data scripts
+    embedding vector(1536),
+    -- embeddings model that produced the stored embedding, used to detect stale rows
+    embedding_model TEXT,
+    -- hash of the question, used to deduplicate FAQs on bulk ingestion
+    question_hash TEXT GENERATED ALWAYS AS (md5(question)) STORED
 );
 
+-- Upgrade tables created by earlier versions of this script
+ALTER TABLE faqs ADD COLUMN IF NOT EXISTS embedding_model TEXT;
+ALTER TABLE faqs ADD COLUMN IF NOT EXISTS question_hash TEXT GENERATED ALWAYS AS (md5(question)) STORED;
+
+-- One FAQ per question, enforced on the hash so the index stays small
+CREATE UNIQUE INDEX IF NOT EXISTS faqs_question_hash_idx ON faqs (question_hash);
+
+-- The approximate nearest neighbour index for the cosine (<=>) similarity
+-- search, faqs_embedding_idx, is created, rebuilt or dropped by the data
+-- scripts to match VECTOR_INDEX_TYPE (see app/services/ann_index.py)
+
+-- Incremental maintenance: the question hash the stored embedding was computed
+-- from, so edited questions are re-embedded, and the time of the last change
+-- to the question, answer or embedding, the watermark of the change feed
+ALTER TABLE faqs ADD COLUMN IF NOT EXISTS embedding_hash TEXT;
+ALTER TABLE faqs ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp();
+UPDATE faqs SET embedding_hash = question_hash WHERE embedding IS NOT NULL AND embedding_hash IS NULL;
+CREATE INDEX IF NOT EXISTS faqs_updated_at_idx ON faqs (updated_at);
+
+-- Deleted FAQ ids, so processes polling the change feed also see deletions
+CREATE TABLE IF NOT EXISTS faq_deletions (
+    id INTEGER NOT NULL,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+CREATE INDEX IF NOT EXISTS faq_deletions_deleted_at_idx ON faq_deletions (deleted_at);
+
+CREATE OR REPLACE FUNCTION faqs_touch() RETURNS trigger AS $$
+BEGIN
+    IF NEW.question IS DISTINCT FROM OLD.question
+        OR NEW.answer IS DISTINCT FROM OLD.answer
+        OR NEW.embedding IS DISTINCT FROM OLD.embedding THEN
+        NEW.updated_at := clock_timestamp();
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION faqs_record_deletion() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO faq_deletions (id) VALUES (OLD.id);
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql;
+
+-- Wake up listening app processes once per statement; they read the changes
+-- themselves, so bulk statements don't send one notification per row
+CREATE OR REPLACE FUNCTION faqs_notify() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('faq_changes', TG_OP);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS faqs_touch ON faqs;
+CREATE TRIGGER faqs_touch BEFORE UPDATE ON faqs
+    FOR EACH ROW EXECUTE FUNCTION faqs_touch();
+DROP TRIGGER IF EXISTS faqs_record_deletion ON faqs;
+CREATE TRIGGER faqs_record_deletion AFTER DELETE ON faqs
+    FOR EACH ROW EXECUTE FUNCTION faqs_record_deletion();
+DROP TRIGGER IF EXISTS faqs_notify ON faqs;
+CREATE TRIGGER faqs_notify AFTER INSERT OR UPDATE OR DELETE ON faqs
+    FOR EACH STATEMENT EXECUTE FUNCTION faqs_notify();
+
+-- Questions asked, with their top-k candidates, answer source and stage
+-- timings, written in batches by the app when QUERY_LOG=postgres and analysed
+-- offline with app/scripts/analyze_query_log.py
+CREATE TABLE IF NOT EXISTS query_log (
+    id BIGSERIAL PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL,
+    question TEXT NOT NULL,
+    -- best candidate after reranking, and the candidates with their final and vector scores
+    faq_id INTEGER,
+    candidate_ids INTEGER[],
+    scores REAL[],
+    vector_scores REAL[],
+    source TEXT,
+    -- seconds spent in each stage of the request
+    timings JSONB,
+    -- embedding space of `embedding`, stored when QUERY_LOG_EMBEDDINGS is set
+    embedding_model TEXT,
+    embedding vector
+);
+CREATE INDEX IF NOT EXISTS query_log_created_at_idx ON query_log (created_at);
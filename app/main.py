@@ -1,18 +1,52 @@
 from fastapi import FastAPI, Request, HTTPException, status, Depends
-from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse
+from fastapi.responses import (
+    Response,
+    JSONResponse,
+    ORJSONResponse,
+    HTMLResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
 from datetime import datetime
-from sqlalchemy.ext.asyncio import AsyncSession
+from functools import lru_cache
+from typing import Tuple
+import orjson
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
 
 from app.services.config import settings
+from app.services.admission import Overloaded, llm_limiter, rate_limiter
+from app.services.ask import ask_service, AskError
+from app.services.http_client import close_http_client
 from app.services.openai_client import openai_client
-from app.utils.logger import logger
-from app.db import get_db
+from app.utils.logger import add_file_sink, logger
+from app.utils.responses import FAQResponse, etag_for, etag_matches
+from app.utils.access_log import AccessLogMiddleware
+from app.utils.metrics import (
+    ANSWERS,
+    REQUEST_LATENCY,
+    server_timing_header,
+    start_request_timings,
+    timed,
+)
+from app.db import AsyncSessionLocal, ping_database, warm_up_pool
 from app.services.similarity import similarity_service  # Import similarity service
+from app.services.embeddings import embedding_service
+from app.services.faq_sync import faq_change_feed
+from app.services.query_log import query_log
+from app.services.vector_index import vector_index
 
 from pathlib import Path
+import asyncio
 import os
+import time
 
 # Define base directories using pathlib for better path management
 BASE_DIR = Path(__file__).resolve().parent
@@ -20,16 +54,19 @@ STATIC_DIR = BASE_DIR / "static"  # Directory for static files
 TEMPLATES_DIR = BASE_DIR / "templates"  # Directory for HTML templates
 LOGS_DIR = BASE_DIR / "logs"  # Directory for log files
 
-# Ensure the logs directory exists
-LOGS_DIR.mkdir(parents=True, exist_ok=True)
-
-# Configure Loguru to write logs to the logs directory
-logger.add(
-    LOGS_DIR / "app.log", rotation="1 MB", retention="10 days", compression="zip"
-)
-
 # Initialize FastAPI app
 app = FastAPI()
+# Set once the startup warm-up has finished, cleared on shutdown
+app.state.ready = False
+
+# Write one sampled access record per request instead of per-stage log lines
+app.add_middleware(AccessLogMiddleware)
+
+# Compress long responses for clients that accept gzip; prepared FAQ answers
+# arrive already compressed and are passed through
+app.add_middleware(
+    GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE, compresslevel=settings.GZIP_LEVEL
+)
 
 # Mount static files (CSS, JS, images, etc.)
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
@@ -44,13 +81,87 @@ EXPECTED_TOKEN = os.getenv("API_TOKEN")
 @app.on_event("startup")
 async def startup_event():
     """
-    Print some information about the application on startup.
+    Print some information about the application on startup, then warm up
+    everything the first request would otherwise pay for: the API clients or
+    local embeddings model, the database connections and the in-memory indexes.
     """
+    # Write logs to the logs directory as well
+    add_file_sink(LOGS_DIR)
+
     logger.info("Starting up the application...")
     logger.info(f"Similarity threshold: {settings.SIMILARITY_THRESHOLD}")
     logger.info(f"Embeddings model: {settings.EMBEDDINGS_MODEL}")
     logger.info(f"OpenAI API key present: {bool(settings.OPENAI_API_KEY)}")
-    logger.info("AskMe web application is ready.")
+    logger.info(f"Embedding provider: {settings.EMBEDDING_PROVIDER}")
+    logger.info(f"Vector backend: {settings.VECTOR_BACKEND}")
+
+    started = time.perf_counter()
+
+    # Create the API clients, or load a local embeddings model
+    await embedding_service.load_model()
+    openai_client.warm_up()
+
+    # Open the pooled database connections ahead of the first requests
+    try:
+        await warm_up_pool(settings.DB_POOL_SIZE)
+    except Exception as e:
+        logger.error(f"Error opening database connections: {e}")
+
+    # Record the questions asked in the background, for offline analysis
+    query_log.start()
+
+    # Keep answering /healthz when the database is down; /readyz stays 503
+    # until loading the indexes succeeds
+    if not await load_indexes(started):
+        app.state.warm_up_task = asyncio.create_task(retry_load_indexes(started))
+
+
+async def load_indexes(started: float) -> bool:
+    """
+    Warm the in-memory index so the first request doesn't pay for loading it,
+    then follow the FAQ changes and mark the worker ready. Returns False when
+    the index could not be loaded.
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            await similarity_service.load_index(db)
+    except Exception as e:
+        logger.error(f"Error loading the similarity index: {e}")
+        return False
+
+    # Apply FAQ changes from the time the in-memory index was built or exported
+    if settings.FAQ_CHANGE_FEED:
+        watermark = vector_index.watermark if similarity_service.backend == "memory" else None
+        faq_change_feed.start(watermark)
+
+    app.state.ready = True
+    logger.info(
+        f"AskMe web application is ready (warm-up took {time.perf_counter() - started:.2f}s)."
+    )
+    return True
+
+
+async def retry_load_indexes(started: float):
+    while True:
+        await asyncio.sleep(settings.WARM_UP_RETRY_INTERVAL)
+        if await load_indexes(started):
+            return
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Release shared resources when the application stops.
+    """
+    # Take the worker out of rotation while it drains
+    app.state.ready = False
+    warm_up_task = getattr(app.state, "warm_up_task", None)
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    await faq_change_feed.stop()
+    # Write the query log entries still queued
+    await query_log.stop()
+    await close_http_client()
 
 
 def get_token(request: Request):
@@ -67,6 +178,20 @@ def get_token(request: Request):
     return True
 
 
+def enforce_rate_limit(request: Request, cost: int = 1):
+    """
+    Charge `cost` questions to the request's API token, rejecting the request
+    with 429 and a Retry-After header once the token exceeds its rate.
+    """
+    retry_after = rate_limiter.acquire(request.headers.get("Authorization", ""), cost)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
 # Route to serve favicon.ico for browsers
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
@@ -76,87 +201,285 @@ async def favicon():
     return RedirectResponse(url="/static/favicon.ico")
 
 
+@lru_cache(maxsize=2)
+def render_index(current_year: int) -> Tuple[bytes, str]:
+    """
+    Render the main page once per year (its only variable) and return the
+    HTML with its ETag, weak as the page may be sent gzipped.
+    """
+    logger.debug("Rendering the main form page.")
+    body = templates.get_template("index.html").render(current_year=current_year)
+    body = body.encode("utf-8")
+    return body, f"W/{etag_for(body)}"
+
+
 # Root endpoint to serve the index.html template
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     """
-    Serve the main page of the application.
+    Serve the main page of the application, answering 304 when the client's
+    cached copy is still current.
     """
-    logger.info("Rendering the main form page.")
     current_year = datetime.now().year  # Pass current year to the template
-    return templates.TemplateResponse(
-        "index.html", {"request": request, "current_year": current_year}
+    body, etag = render_index(current_year)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.PAGE_MAX_AGE}"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return HTMLResponse(body, headers=headers)
+
+
+# Liveness probe
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """
+    The worker is up and serving requests; it may still be warming up.
+    """
+    return JSONResponse({"status": "ok"})
+
+
+# Readiness probe
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """
+    The worker has finished warming up and the database answers, so it can
+    take traffic. Returns 503 otherwise.
+    """
+    checks = {
+        "warmed_up": app.state.ready,
+        "database": await ping_database(settings.READINESS_TIMEOUT),
+    }
+    ready = all(checks.values())
+    return JSONResponse(
+        {"status": "ready" if ready else "not ready", "checks": checks},
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
     )
 
 
+# Expose Prometheus metrics for scraping
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Serve latency histograms and answer/cache counters in Prometheus format.
+    Under gunicorn the values of every worker are aggregated.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+async def read_json_object(request: Request) -> dict:
+    """
+    Parse the request body as a JSON object, answering 400 to anything else.
+    """
+    try:
+        with timed("parse"):
+            data = orjson.loads(await request.body())
+    except Exception as e:
+        logger.error(f"Invalid JSON payload: {e}")
+        raise HTTPException(status_code=400, detail="Invalid JSON payload.")
+    if not isinstance(data, dict):
+        logger.error("Invalid JSON payload: not an object.")
+        raise HTTPException(status_code=400, detail="Invalid JSON payload.")
+    return data
+
+
+def timed_json_response(
+    request: Request, payload: dict, timings: dict, started: float, endpoint: str
+) -> Response:
+    """
+    Serialize a JSON response, recording the serialization stage, the total
+    request latency and, when enabled, a Server-Timing header. Local FAQ
+    answers are sent from their prepared body; other answers are not cacheable.
+    """
+    with timed("serialize"):
+        if isinstance(payload, FAQResponse):
+            response = payload.to_response(request)
+        else:
+            response = ORJSONResponse(payload, headers={"Cache-Control": "no-store"})
+    REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+    if settings.SERVER_TIMING_HEADER:
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
+
 # POST endpoint to handle user questions
 @app.post("/ask-question", response_class=JSONResponse)
 async def ask_question(
     request: Request,
     token: bool = Depends(get_token),
-    db: AsyncSession = Depends(get_db),
 ):
     """
     Process user questions, perform similarity search, and respond accordingly.
     Requires a valid authentication token.
     """
-    try:
-        data = await request.json()
-    except Exception as e:
-        logger.error(f"Invalid JSON payload: {e}")
-        raise HTTPException(status_code=400, detail="Invalid JSON payload.")
+    started = time.perf_counter()
+    timings = start_request_timings()
+    enforce_rate_limit(request)
 
-    user_question = data.get("user_question", "").strip()
+    data = await read_json_object(request)
+
+    user_question = data.get("user_question")
+    user_question = user_question.strip() if isinstance(user_question, str) else ""
 
     if not user_question:
         logger.error("No question provided.")
         raise HTTPException(status_code=400, detail="No question provided.")
 
-    logger.info(f"Received question: {user_question}")
+    logger.debug("Received question: {}", user_question)
 
-    # Find the most similar question from the FAQ
     try:
-        faq_entry, similarity_score = await similarity_service.find_most_similar(
-            user_question, db
-        )
+        response = await ask_service.answer(user_question)
+    except AskError as e:
+        raise HTTPException(status_code=500, detail=e.detail)
 
-        logger.info(f"Similarity score: {similarity_score}")
-    except Exception as e:
-        logger.error(f"Error during similarity search: {e}")
+    ANSWERS.labels(response["source"]).inc()
+    request.state.answer_source = response["source"]
+    return timed_json_response(request, response, timings, started, "ask-question")
+
+
+# POST endpoint to answer many questions in one request
+@app.post("/ask-questions", response_class=JSONResponse)
+async def ask_questions(
+    request: Request,
+    token: bool = Depends(get_token),
+):
+    """
+    Process a batch of user questions with one embedding call and one similarity
+    search, forwarding only the unmatched questions to OpenAI.
+    Requires a valid authentication token.
+    """
+    started = time.perf_counter()
+    timings = start_request_timings()
+
+    data = await read_json_object(request)
+
+    user_questions = data.get("user_questions")
+    if not isinstance(user_questions, list) or not user_questions:
+        logger.error("No questions provided.")
+        raise HTTPException(status_code=400, detail="No questions provided.")
+    if len(user_questions) > settings.BATCH_MAX_QUESTIONS:
         raise HTTPException(
-            status_code=500, detail="Internal Server Error during similarity search."
+            status_code=400,
+            detail=f"At most {settings.BATCH_MAX_QUESTIONS} questions per batch.",
         )
 
-    # Make sure the similarity score and settings threshold are floats
-    # If not, convert them to floats
-    if not isinstance(similarity_score, float):
-        similarity_score = float(similarity_score)
-    if not isinstance(settings.SIMILARITY_THRESHOLD, float):
-        settings.SIMILARITY_THRESHOLD = float(settings.SIMILARITY_THRESHOLD)
+    user_questions = [
+        question.strip() if isinstance(question, str) else ""
+        for question in user_questions
+    ]
+    if not all(user_questions):
+        logger.error("Empty question in batch.")
+        raise HTTPException(status_code=400, detail="Every question must be non-empty.")
+
+    enforce_rate_limit(request, len(user_questions))
+
+    logger.debug("Received batch of {} questions.", len(user_questions))
+
+    try:
+        responses = await ask_service.answer_batch(user_questions)
+    except AskError as e:
+        raise HTTPException(status_code=500, detail=e.detail)
+
+    for response in responses:
+        ANSWERS.labels(response["source"]).inc()
+    return timed_json_response(
+        request, {"answers": responses}, timings, started, "ask-questions"
+    )
+
+
+def sse_event(event: str, data: dict) -> str:
+    """
+    Format a server-sent event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
 
-    # Check similarity and decide response source
-    if faq_entry is None or similarity_score < settings.SIMILARITY_THRESHOLD:
-        # If no similar question found or similarity below threshold, forward to OpenAI API
+
+# POST endpoint streaming the answer as server-sent events
+@app.post("/ask-question/stream")
+async def ask_question_stream(
+    request: Request,
+    token: bool = Depends(get_token),
+):
+    """
+    Streaming variant of /ask-question. Local FAQ and cached answers are sent
+    as a single `answer` event; OpenAI answers are sent as a `meta` event,
+    one `token` event per chunk and a final `done` event with the full answer.
+    Requires a valid authentication token.
+    """
+    started = time.perf_counter()
+    start_request_timings()
+    enforce_rate_limit(request)
+
+    data = await read_json_object(request)
+
+    user_question = data.get("user_question")
+    user_question = user_question.strip() if isinstance(user_question, str) else ""
+
+    if not user_question:
+        logger.error("No question provided.")
+        raise HTTPException(status_code=400, detail="No question provided.")
+
+    logger.debug("Received question for streaming: {}", user_question)
+
+    try:
+        embedding, response, candidates = await ask_service.lookup(user_question)
+    except AskError as e:
+        raise HTTPException(status_code=500, detail=e.detail)
+
+    # Shed the stream before it starts when OpenAI has no capacity left
+    if response is None and llm_limiter.saturated:
+        response = ask_service.degraded_answer(candidates[0] if candidates else None)
+        if response is None:
+            llm_limiter.reject()
+
+    source = response["source"] if response else "OpenAI"
+    ANSWERS.labels(source).inc()
+    request.state.answer_source = source
+
+    async def events():
         try:
-            answer = openai_client.get_answer(user_question)
-            response = {"source": "OpenAI", "matched_question": "N/A", "answer": answer}
-            logger.info("Answer sourced from OpenAI API.")
-        except Exception as e:
-            logger.error(f"Error fetching answer from OpenAI: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail="Internal Server Error fetching answer from OpenAI.",
+            if response is not None:
+                yield sse_event("answer", response)
+                query_log.record(user_question, candidates, source, embedding)
+                return
+
+            yield sse_event("meta", {"source": "OpenAI", "matched_question": "N/A"})
+            parts = []
+            try:
+                async for token in ask_service.stream_answer(user_question, embedding):
+                    parts.append(token)
+                    yield sse_event("token", {"text": token})
+            except Exception as e:
+                logger.error(f"Error streaming answer from OpenAI: {e}")
+                yield sse_event(
+                    "error", {"detail": "Internal Server Error fetching answer from OpenAI."}
+                )
+                return
+
+            yield sse_event(
+                "done",
+                {
+                    "source": "OpenAI",
+                    "matched_question": "N/A",
+                    "answer": "".join(parts).strip(),
+                },
+            )
+            # Logged once answered, so the entry includes the OpenAI stage
+            query_log.record(user_question, candidates, source, embedding)
+        finally:
+            # The stream is only answered once its last event is sent
+            REQUEST_LATENCY.labels("ask-question-stream").observe(
+                time.perf_counter() - started
             )
-    else:
-        # Use the local FAQ answer
-        response = {
-            "source": "Local FAQ",
-            "matched_question": faq_entry["question"],
-            "answer": faq_entry["answer"],
-        }
-        logger.info("Answer sourced from local FAQ database.")
 
-    return JSONResponse(response)
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from caching or buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # Custom handler for 404 errors (page not found)
@@ -196,6 +519,27 @@ async def custom_http_exception_handler(request: Request, exc: HTTPException):
             "error_detail": exc.detail,
         },
         status_code=exc.status_code,
+        headers=getattr(exc, "headers", None),
+    )
+
+
+# Custom handler for requests shed by an overloaded stage
+@app.exception_handler(Overloaded)
+async def overloaded_exception_handler(request: Request, exc: Overloaded):
+    """
+    Reject the request with 503 and a Retry-After header.
+    """
+    logger.warning(f"Request shed: {exc}")
+    return templates.TemplateResponse(
+        "error.html",
+        {
+            "request": request,
+            "error_code": 503,
+            "error_message": "Service Unavailable",
+            "error_detail": "The service is overloaded, please retry shortly.",
+        },
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(exc.retry_after)},
     )
 
 
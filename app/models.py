@@ -1,11 +1,41 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Computed,
+    DateTime,
+    Integer,
+    REAL,
+    String,
+    func,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from pgvector.sqlalchemy import Vector
+from app.services.config import settings
 
 
 Base = declarative_base()
 
 
+class BinaryVector(Vector):
+    """
+    pgvector column passed to asyncpg as-is, so values go through the binary
+    codec registered on every connection (see app/db.py) instead of being
+    formatted and parsed as decimal text.
+    """
+
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        return None
+
+    def result_processor(self, dialect, coltype):
+        def process(value):
+            return None if value is None else value.to_numpy()
+
+        return process
+
+
 # ORM model for FAQs stored in PostgreSQL
 class FAQ(Base):
     __tablename__ = "faqs"
@@ -13,4 +43,46 @@ class FAQ(Base):
     id = Column(Integer, primary_key=True, index=True)
     question = Column(String, nullable=False)
     answer = Column(String, nullable=False)
-    embedding = Column(Vector(1536), nullable=True)
+    embedding = Column(BinaryVector(settings.EMBEDDING_DIMENSIONS), nullable=True)
+    # Embedding space (model and dimensions) of `embedding`; rows from another one are stale
+    embedding_model = Column(String, nullable=True)
+    # md5 of the question, backing the unique index used to deduplicate FAQs
+    question_hash = Column(String, Computed("md5(question)", persisted=True), unique=True)
+    # question_hash the embedding was computed from; differs once the question is edited
+    embedding_hash = Column(String, nullable=True)
+    # Last change to the question, answer or embedding (maintained by a trigger)
+    updated_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.clock_timestamp()
+    )
+
+
+# Ids of deleted FAQs, recorded by a trigger for the change feed
+class FAQDeletion(Base):
+    __tablename__ = "faq_deletions"
+
+    id = Column(Integer, primary_key=True)
+    deleted_at = Column(
+        DateTime(timezone=True),
+        primary_key=True,
+        server_default=func.clock_timestamp(),
+    )
+
+
+# Questions asked and how they were answered, written by the query log
+class QueryLogEntry(Base):
+    __tablename__ = "query_log"
+
+    id = Column(BigInteger, primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    question = Column(String, nullable=False)
+    # Best candidate after reranking, then all candidates with their scores, best first
+    faq_id = Column(Integer, nullable=True)
+    candidate_ids = Column(ARRAY(Integer), nullable=True)
+    scores = Column(ARRAY(REAL), nullable=True)
+    vector_scores = Column(ARRAY(REAL), nullable=True)
+    source = Column(String, nullable=True)
+    # Seconds spent in each stage of the request
+    timings = Column(JSONB, nullable=True)
+    # Embedding space of `embedding`, only stored when QUERY_LOG_EMBEDDINGS is set
+    embedding_model = Column(String, nullable=True)
+    embedding = Column(BinaryVector(), nullable=True)
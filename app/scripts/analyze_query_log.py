@@ -0,0 +1,234 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+
+from app.db import AsyncSessionLocal, engine
+from app.models import QueryLogEntry
+from app.services.config import settings
+from app.services.query_log import parquet_schema
+from app.services.similarity import similarity_service
+
+# Sources answered without calling OpenAI at the logged threshold
+LOCAL_SOURCES = ("Local FAQ", "Degraded FAQ")
+# Threshold the logged answers were given at (may be set as a string in the environment)
+THRESHOLD = float(settings.SIMILARITY_THRESHOLD)
+# Width of the score band below the threshold reported as borderline
+BORDERLINE_MARGIN = 0.05
+
+
+async def load_postgres(since: Optional[datetime], embeddings: bool) -> List[dict]:
+    columns = [column for column in QueryLogEntry.__table__.columns]
+    if not embeddings:
+        columns = [column for column in columns if column.name != "embedding"]
+    query = select(*columns).order_by(QueryLogEntry.created_at)
+    if since is not None:
+        query = query.where(QueryLogEntry.created_at >= since)
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(query)).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def load_parquet(path: Path, since: Optional[datetime]) -> List[dict]:
+    import pyarrow.parquet as pq
+
+    entries = []
+    for file in sorted(path.glob("*.parquet")):
+        table = pq.read_table(file, schema=parquet_schema())
+        for entry in table.to_pylist():
+            if since is not None and entry["created_at"] < since:
+                continue
+            entry["timings"] = json.loads(entry["timings"] or "{}")
+            entries.append(entry)
+    return entries
+
+
+def total_latency(entry: dict) -> float:
+    return sum((entry["timings"] or {}).values())
+
+
+def top_score(entry: dict) -> float:
+    return entry["scores"][0] if entry["scores"] else 0.0
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def mean(values: List[float]) -> float:
+    return statistics.fmean(values) if values else 0.0
+
+
+def report_sources(entries: List[dict]):
+    print(f"\n{len(entries)} questions logged")
+    print(f"{'source':<14} {'count':>8} {'share':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    by_source: Dict[str, List[float]] = {}
+    for entry in entries:
+        by_source.setdefault(entry["source"] or "-", []).append(total_latency(entry))
+    for source, latencies in sorted(by_source.items(), key=lambda item: -len(item[1])):
+        print(
+            f"{source:<14} {len(latencies):>8} {len(latencies) / len(entries):>7.1%} "
+            f"{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f}"
+        )
+
+
+def report_thresholds(entries: List[dict], thresholds: List[float]):
+    """
+    Replay the logged top scores against each candidate threshold. Latency and
+    OpenAI calls are estimated from the logged local and fallback answers:
+    the share of fallbacks served by the answer cache is assumed unchanged.
+    """
+    local = [total_latency(e) for e in entries if e["source"] in LOCAL_SOURCES]
+    fallback = [e for e in entries if e["source"] not in LOCAL_SOURCES]
+    fallback_latency = [total_latency(e) for e in fallback]
+    openai_share = (
+        sum(e["source"] == "OpenAI" for e in fallback) / len(fallback) if fallback else 1.0
+    )
+
+    print(f"\n{'threshold':>9} {'fallback':>9} {'OpenAI/1000':>12} {'mean ms':>8}")
+    for threshold in thresholds:
+        rate = sum(top_score(e) < threshold for e in entries) / len(entries)
+        latency = (1 - rate) * mean(local) + rate * mean(fallback_latency)
+        marker = "  <- current" if abs(threshold - THRESHOLD) < 1e-9 else ""
+        print(
+            f"{threshold:>9.3f} {rate:>9.1%} {rate * openai_share * 1000:>12.0f} "
+            f"{latency * 1000:>8.1f}{marker}"
+        )
+
+
+def report_borderline(entries: List[dict], examples: int):
+    """
+    Most frequent questions scoring just below the current threshold: the
+    ones a lower threshold, or a new FAQ, would answer locally.
+    """
+    threshold = THRESHOLD
+    borderline = Counter(
+        entry["question"]
+        for entry in entries
+        if threshold - BORDERLINE_MARGIN <= top_score(entry) < threshold
+    )
+    if not borderline:
+        return
+    print(f"\nQuestions scoring within {BORDERLINE_MARGIN} below {threshold}:")
+    for question, count in borderline.most_common(examples):
+        print(f"{count:>6}  {question}")
+
+
+async def replay(entries: List[dict]):
+    """
+    Search the logged question embeddings again with the current index and
+    reranking settings (VECTOR_BACKEND, SIMILARITY_TOP_K, HNSW_EF_SEARCH, ...).
+    """
+    entries = [
+        e
+        for e in entries
+        if e.get("embedding") is not None and e["embedding_model"] == settings.EMBEDDING_SPACE
+    ]
+    if not entries:
+        print(
+            f"\nNo logged embeddings from {settings.EMBEDDING_SPACE} to replay "
+            "(set QUERY_LOG_EMBEDDINGS=true to store them)."
+        )
+        return
+
+    agreed = fallbacks = 0
+    latencies = []
+    async with AsyncSessionLocal() as db:
+        await similarity_service.load_index(db)
+        for entry in entries:
+            started = time.perf_counter()
+            candidates = await similarity_service.find_candidates(
+                entry["embedding"], db, entry["question"]
+            )
+            latencies.append(time.perf_counter() - started)
+            best = candidates[0] if candidates else None
+            agreed += (best["id"] if best else None) == entry["faq_id"]
+            fallbacks += best is None or best["similarity_score"] < THRESHOLD
+
+    print(f"\nReplayed {len(entries)} questions on the {similarity_service.backend} backend")
+    print(f"Fallback rate at {THRESHOLD}: {fallbacks / len(entries):.1%}")
+    print(f"Same best FAQ as logged: {agreed / len(entries):.1%}")
+    print(
+        f"Search latency: p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+        f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms"
+    )
+
+
+async def analyze_query_log(args):
+    since = (
+        datetime.now(timezone.utc) - timedelta(days=args.since) if args.since else None
+    )
+    try:
+        if args.source == "postgres":
+            entries = await load_postgres(since, args.replay)
+        else:
+            entries = load_parquet(Path(args.path), since)
+
+        if not entries:
+            print("The query log is empty.")
+            return
+
+        report_sources(entries)
+        report_thresholds(entries, args.thresholds)
+        report_borderline(entries, args.examples)
+        if args.replay:
+            await replay(entries)
+    except Exception as e:
+        print(f"Error analyzing the query log: {e}")
+    finally:
+        await engine.dispose()
+
+
+def default_thresholds() -> List[float]:
+    return [round(THRESHOLD + step / 100, 3) for step in range(-10, 11, 2)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the fallback rate and latency the query log would "
+        "have seen at other similarity thresholds and index settings."
+    )
+    parser.add_argument(
+        "--source",
+        choices=("postgres", "parquet"),
+        default="parquet" if settings.QUERY_LOG == "parquet" else "postgres",
+        help="Where the query log was written (default: from QUERY_LOG).",
+    )
+    parser.add_argument(
+        "--path",
+        default=settings.QUERY_LOG_PATH,
+        help="Directory of the Parquet files (default: QUERY_LOG_PATH).",
+    )
+    parser.add_argument(
+        "--since", type=float, default=0, help="Only analyze the last N days."
+    )
+    parser.add_argument(
+        "--thresholds",
+        type=lambda value: [float(t) for t in value.split(",")],
+        default=default_thresholds(),
+        help="Comma-separated thresholds to compare (default: around SIMILARITY_THRESHOLD).",
+    )
+    parser.add_argument(
+        "--examples",
+        type=int,
+        default=10,
+        help="Borderline questions to list (default: 10).",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Search the logged embeddings again with the current index settings.",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(analyze_query_log(args))
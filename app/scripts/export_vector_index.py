@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+from pathlib import Path
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.db import set_up_connection
+from app.services.config import settings
+from app.services.vector_index import InMemoryVectorIndex
+
+# Set up database URL
+DATABASE_URL = f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
+
+
+async def export_vector_index(path: Path):
+    """
+    Stream every FAQ embedding from the database into the snapshot file that
+    the workers memory-map instead of each loading its own copy.
+    """
+    print(f"Exporting the vector index snapshot to {path}...")
+    # A short-lived engine, disposed before gunicorn forks its workers
+    engine = create_async_engine(DATABASE_URL, echo=settings.DB_ECHO)
+    event.listen(engine.sync_engine, "connect", set_up_connection)
+    SessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, bind=engine, class_=AsyncSession
+    )
+
+    try:
+        async with SessionLocal() as db:
+            rows = await InMemoryVectorIndex.export(
+                db, path, settings.VECTOR_SNAPSHOT_DTYPE
+            )
+        print(f"Exported {rows} FAQ embeddings.")
+    except Exception as e:
+        print(f"Error exporting the vector index snapshot: {e}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the FAQ embeddings as a memory-mapped index snapshot."
+    )
+    parser.add_argument(
+        "path",
+        nargs="?",
+        default=settings.VECTOR_INDEX_PATH,
+        help="Snapshot file (default: VECTOR_INDEX_PATH).",
+    )
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("No snapshot file given and VECTOR_INDEX_PATH is not set.")
+
+    asyncio.run(export_vector_index(Path(args.path)))
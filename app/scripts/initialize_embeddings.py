@@ -1,10 +1,14 @@
+import argparse
 import asyncio
-import json
+from pathlib import Path
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from app.models import FAQ
+from app.db import apply_schema, set_up_connection
+from app.services.ann_index import index_matches_settings, rebuild_index
 from app.services.config import settings
 from app.services.embeddings import embedding_service  # Import your embedding service
+from app.services.vector_index import InMemoryVectorIndex
 
 # Set up database URL
 DATABASE_URL = f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
@@ -12,7 +16,9 @@ DATABASE_URL = f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRE
 print("EMBEDDINGS:DATABASE_URL:", DATABASE_URL)
 
 # Create the async engine
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(DATABASE_URL, echo=settings.DB_ECHO)
+# Bind vectors in binary form like the app does
+event.listen(engine.sync_engine, "connect", set_up_connection)
 
 # Create the async session
 SessionLocal = sessionmaker(
@@ -20,18 +26,59 @@ SessionLocal = sessionmaker(
 )
 
 
-async def compute_and_store_embeddings():
+async def compute_and_store_embeddings(
+    reembed: bool = False, rebuild_vector_index: bool = False
+):
     print("Computing and storing embeddings...")
     async with SessionLocal() as db:
         try:
+            # Make sure the schema has the columns the embedding pipeline relies on
+            await apply_schema(db)
+
             # Compute embeddings using the EmbeddingService and store them directly in the database
-            await embedding_service.compute_embeddings(db)
+            embedded = await embedding_service.compute_embeddings(db, reembed=reembed)
             print("Embeddings computed and stored successfully.")
+
+            # Rebuilding after a bulk embed gives IVFFlat fresh centroids and
+            # HNSW a compact graph. IVFFlat is always rebuilt after embedding,
+            # as its lists are derived from the embedded rows, and a missing
+            # index (skipped while there were no embeddings) is built now
+            ivfflat = settings.VECTOR_INDEX_TYPE.lower() == "ivfflat"
+            if (
+                rebuild_vector_index
+                or (ivfflat and embedded > 0)
+                or not await index_matches_settings(db)
+            ):
+                await rebuild_index(db)
+
+            # Refresh the snapshot the workers map at startup
+            if settings.VECTOR_INDEX_PATH:
+                rows = await InMemoryVectorIndex.export(
+                    db, Path(settings.VECTOR_INDEX_PATH), settings.VECTOR_SNAPSHOT_DTYPE
+                )
+                print(f"Exported {rows} FAQ embeddings to {settings.VECTOR_INDEX_PATH}.")
         except Exception as e:
             print(f"Error computing embeddings: {e}")
             await db.rollback()  # Rollback in case of error
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute embeddings for the FAQs.")
+    parser.add_argument(
+        "--reembed",
+        action="store_true",
+        help="Re-embed every FAQ instead of only missing or stale embeddings.",
+    )
+    parser.add_argument(
+        "--rebuild-index",
+        action="store_true",
+        help="Rebuild the vector index once the embeddings are stored.",
+    )
+    args = parser.parse_args()
+
     # Use asyncio to run the compute_and_store_embeddings function
-    asyncio.run(compute_and_store_embeddings())
+    asyncio.run(
+        compute_and_store_embeddings(
+            reembed=args.reembed, rebuild_vector_index=args.rebuild_index
+        )
+    )
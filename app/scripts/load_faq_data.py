@@ -1,9 +1,11 @@
+import argparse
 import asyncio
 import json
+import time
+from typing import Iterator, TextIO
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.future import select
-from app.models import FAQ
+from app.db import apply_schema
 from app.services.config import settings
 
 
@@ -11,38 +13,137 @@ from app.services.config import settings
 DATABASE_URL = f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
 
 # Create the async engine
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(DATABASE_URL, echo=settings.DB_ECHO)
 
 # Create the async session
 SessionLocal = sessionmaker(
     autocommit=False, autoflush=False, bind=engine, class_=AsyncSession
 )
 
+# Size of each read from the input file when streaming a JSON array
+READ_CHUNK_SIZE = 1 << 16
 
-async def load_faq_data():
+
+def iter_json_array(f: TextIO) -> Iterator[dict]:
+    """
+    Yield the objects of a top-level JSON array one at a time, without loading
+    the whole file into memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("Expected a JSON array of FAQ entries.")
+    pos = 1
+
+    while True:
+        # Skip whitespace and separators, reading more input as needed
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buffer):
+            more = f.read(READ_CHUNK_SIZE)
+            if not more:
+                raise ValueError("Unexpected end of the JSON array.")
+            buffer, pos = more, 0
+            continue
+        if buffer[pos] == "]":
+            return
+
+        try:
+            entry, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # The entry is cut off at the end of the buffer; read more and retry
+            more = f.read(READ_CHUNK_SIZE)
+            if not more:
+                raise
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+
+        yield entry
+        pos = end
+
+
+def iter_json_lines(f: TextIO) -> Iterator[dict]:
+    """
+    Yield one FAQ entry per non-empty line of a JSONL file.
+    """
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_faq_entries(path: str) -> Iterator[dict]:
+    """
+    Stream FAQ entries from a JSON array or JSONL file, detected from its content.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.read(READ_CHUNK_SIZE)
+        f.seek(0)
+        if first.lstrip().startswith("["):
+            yield from iter_json_array(f)
+        else:
+            yield from iter_json_lines(f)
+
+
+async def load_faq_data(path: str = "data/faq_data.json", batch_size: int = 5000):
     print("Loading FAQ data...")
     async with SessionLocal() as db:
         try:
-            # Load the JSON data
-            with open("data/faq_data.json", "r", encoding="utf-8") as f:
-                faq_data = json.load(f)
-                print(f"Loaded {len(faq_data)} FAQ entries.")
-
-            for faq in faq_data:
-                # Check if the FAQ entry already exists based on the question
-                result = await db.execute(
-                    select(FAQ).filter_by(question=faq["question"])
-                )
-                existing_faq = result.scalars().first()
-
-                if existing_faq:
-                    print(f"Skipping duplicate entry: {faq['question']}")
-                else:
-                    # Insert the new FAQ if not already present
-                    new_faq = FAQ(question=faq["question"], answer=faq["answer"])
-                    db.add(new_faq)
+            # Make sure the unique question hash index used for dedup exists
+            await apply_schema(db)
+
+            connection = await db.connection()
+            raw_connection = await connection.get_raw_connection()
+            conn = raw_connection.driver_connection
+
+            # Staging table that each batch is COPYed into before the set-based insert
+            await conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS faqs_staging (question TEXT, answer TEXT)"
+            )
 
+            total = 0
+            inserted = 0
+            started = time.perf_counter()
+
+            async def flush(batch):
+                nonlocal inserted
+                async with conn.transaction():
+                    await conn.copy_records_to_table(
+                        "faqs_staging", records=batch, columns=["question", "answer"]
+                    )
+                    # Deduplicate within the batch and against existing FAQs at once
+                    status = await conn.execute(
+                        """
+                        INSERT INTO faqs (question, answer)
+                        SELECT DISTINCT ON (md5(question)) question, answer
+                        FROM faqs_staging
+                        ON CONFLICT (question_hash) DO NOTHING
+                        """
+                    )
+                    await conn.execute("TRUNCATE faqs_staging")
+                inserted += int(status.split()[-1])
+
+            batch = []
+            for faq in iter_faq_entries(path):
+                batch.append((faq["question"], faq["answer"]))
+                if len(batch) >= batch_size:
+                    await flush(batch)
+                    total += len(batch)
+                    batch = []
+                    elapsed = time.perf_counter() - started
+                    print(f"Processed {total} FAQ entries ({total / elapsed:.0f} rows/sec).")
+            if batch:
+                await flush(batch)
+                total += len(batch)
+            # Commit through the session too, in case it holds a transaction
+            # the batches were nested in
             await db.commit()
+
+            elapsed = time.perf_counter() - started
+            print(
+                f"Loaded {total} FAQ entries: {inserted} inserted, "
+                f"{total - inserted} duplicates skipped in {elapsed:.1f}s "
+                f"({total / max(elapsed, 1e-9):.0f} rows/sec)."
+            )
             print("FAQ data loaded successfully.")
         except Exception as e:
             print(f"Error loading FAQ data: {e}")
@@ -50,4 +151,19 @@ async def load_faq_data():
 
 
 if __name__ == "__main__":
-    asyncio.run(load_faq_data())
+    parser = argparse.ArgumentParser(description="Load FAQ entries into the database.")
+    parser.add_argument(
+        "path",
+        nargs="?",
+        default="data/faq_data.json",
+        help="JSON array or JSONL file of {question, answer} entries.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=5000,
+        help="Number of entries COPYed and inserted per transaction.",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(load_faq_data(args.path, args.batch_size))
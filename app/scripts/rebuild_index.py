@@ -0,0 +1,30 @@
+import asyncio
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.services.ann_index import rebuild_index
+from app.services.config import settings
+
+# Set up database URL
+DATABASE_URL = f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
+
+# Create the async engine
+engine = create_async_engine(DATABASE_URL, echo=settings.DB_ECHO)
+
+# Create the async session
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, class_=AsyncSession
+)
+
+
+async def rebuild_vector_index():
+    print("Rebuilding the vector index...")
+    async with SessionLocal() as db:
+        try:
+            await rebuild_index(db)
+            print("Vector index rebuilt successfully.")
+        except Exception as e:
+            print(f"Error rebuilding the vector index: {e}")
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_vector_index())
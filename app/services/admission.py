@@ -0,0 +1,161 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Tuple
+
+from app.services.config import settings
+from app.utils.metrics import SHED_REQUESTS
+
+
+# Raised when a stage is saturated; surfaced as 503 with a Retry-After header
+class Overloaded(Exception):
+    def __init__(self, stage: str, retry_after: int):
+        super().__init__(f"The {stage} stage is overloaded.")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+# In-flight limit for one stage of the ask pipeline, with a bounded wait queue
+class StageLimiter:
+    """
+    At most `limit` calls run the stage at once and at most `queue_size` more
+    wait for a slot, each for up to `queue_timeout` seconds. Calls beyond that
+    fail immediately with Overloaded, so a spike is shed at the door instead
+    of queuing behind slow calls until every request times out.
+    """
+
+    def __init__(self, stage: str, limit: int, queue_size: int, queue_timeout: float):
+        self.stage = stage
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(self.limit)
+
+    @property
+    def saturated(self) -> bool:
+        """
+        Whether a new call would be rejected right away.
+        """
+        return self._semaphore.locked() and self.waiting >= self.queue_size
+
+    def reject(self):
+        SHED_REQUESTS.labels(self.stage).inc()
+        raise Overloaded(self.stage, max(1, math.ceil(self.queue_timeout)))
+
+    async def _acquire(self) -> bool:
+        """
+        Wait up to `queue_timeout` seconds for a slot. The wait is not
+        cancelled mid-acquire (as wait_for may do on Python < 3.12): a slot
+        granted just as the wait gives up, or as the caller is cancelled, is
+        released again instead of leaking.
+        """
+        acquire = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            done, _ = await asyncio.wait({acquire}, timeout=self.queue_timeout)
+        except BaseException:
+            self._abandon(acquire)
+            raise
+        if done:
+            return True
+        self._abandon(acquire)
+        return False
+
+    def _abandon(self, acquire: asyncio.Future):
+        if acquire.done():
+            if not acquire.cancelled():
+                self._semaphore.release()
+            return
+        acquire.cancel()
+        acquire.add_done_callback(
+            lambda future: future.cancelled() or self._semaphore.release()
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.queue_size:
+                self.reject()
+            self.waiting += 1
+            try:
+                acquired = await self._acquire()
+            finally:
+                self.waiting -= 1
+            if not acquired:
+                self.reject()
+        else:
+            await self._semaphore.acquire()
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+# Token bucket rate limiter keyed by API token
+class RateLimiter:
+    """
+    Each key gets `burst` requests up front, refilled at `per_minute` requests
+    per minute. Buckets live in process memory, so with several workers each
+    enforces the limit for the requests it serves. The least recently used
+    buckets are dropped beyond `max_keys`.
+    """
+
+    def __init__(self, per_minute: float, burst: int, max_keys: int = 10000):
+        self.rate = per_minute / 60
+        self.burst = max(1, burst)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, key: str, cost: int = 1) -> int:
+        """
+        Take `cost` requests from the key's bucket. Returns 0 when allowed,
+        otherwise the seconds to wait before retrying.
+        """
+        if not self.enabled:
+            return 0
+
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+
+        if tokens >= cost:
+            tokens -= cost
+            retry_after = 0
+        else:
+            SHED_REQUESTS.labels("rate_limit").inc()
+            retry_after = max(1, math.ceil((cost - tokens) / self.rate))
+
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+# Instantiate the per-stage limiters and the per-token rate limiter
+embedding_limiter = StageLimiter(
+    "embedding",
+    settings.EMBEDDING_MAX_CONCURRENCY,
+    settings.EMBEDDING_QUEUE_SIZE,
+    settings.QUEUE_TIMEOUT,
+)
+search_limiter = StageLimiter(
+    "vector_search",
+    settings.SEARCH_MAX_CONCURRENCY,
+    settings.SEARCH_QUEUE_SIZE,
+    settings.QUEUE_TIMEOUT,
+)
+llm_limiter = StageLimiter(
+    "llm",
+    settings.OPENAI_MAX_CONCURRENCY,
+    settings.OPENAI_QUEUE_SIZE,
+    settings.QUEUE_TIMEOUT,
+)
+rate_limiter = RateLimiter(settings.RATE_LIMIT_PER_MINUTE, settings.RATE_LIMIT_BURST)
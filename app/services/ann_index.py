@@ -0,0 +1,182 @@
+import math
+from typing import Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import FAQ
+from app.services.config import settings
+from app.utils.logger import logger
+
+# Name of the approximate nearest neighbour index on faqs.embedding
+INDEX_NAME = "faqs_embedding_idx"
+
+
+def search_params_sql() -> str:
+    """
+    SQL setting the query-time search parameters for the ANN index. Both are
+    set so switching VECTOR_INDEX_TYPE needs no other change.
+    """
+    return (
+        f"SET hnsw.ef_search = {int(settings.HNSW_EF_SEARCH)}; "
+        f"SET ivfflat.probes = {int(settings.IVFFLAT_PROBES)}"
+    )
+
+
+async def set_search_params(
+    db: AsyncSession, ef_search: Optional[int] = None, probes: Optional[int] = None
+):
+    """
+    Override the ANN search parameters for the current transaction only, e.g. to
+    trade latency for recall on a single query. Connections otherwise use the
+    configured defaults, applied once when they are opened.
+    """
+    if ef_search is not None:
+        await db.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+    if probes is not None:
+        await db.execute(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
+
+
+def index_target() -> Tuple[str, str]:
+    """
+    Indexed expression and operator class for the configured VECTOR_PRECISION.
+    float16 and binary index a cast of the full-precision column, which is kept
+    for rescoring.
+    """
+    precision = settings.VECTOR_PRECISION
+    dims = int(settings.EMBEDDING_DIMENSIONS)
+
+    if precision == "float32":
+        return "embedding", "vector_cosine_ops"
+    if precision == "float16":
+        return f"(embedding::halfvec({dims}))", "halfvec_cosine_ops"
+    if precision == "binary":
+        return f"(binary_quantize(embedding)::bit({dims}))", "bit_hamming_ops"
+
+    raise ValueError(f"Unknown vector precision: {settings.VECTOR_PRECISION}")
+
+
+def distance_sql(query_vector: str) -> str:
+    """
+    Distance between faqs.embedding and a query vector (an SQL expression of
+    type vector), written against the indexed expression so the index serves it.
+    """
+    precision = settings.VECTOR_PRECISION
+    dims = int(settings.EMBEDDING_DIMENSIONS)
+
+    if precision == "float16":
+        return f"(embedding::halfvec({dims})) <=> ({query_vector})::halfvec({dims})"
+    if precision == "binary":
+        return (
+            f"(binary_quantize(embedding)::bit({dims})) "
+            f"<~> binary_quantize({query_vector})::bit({dims})"
+        )
+    return f"embedding <=> {query_vector}"
+
+
+def build_index_sql(name: str, row_count: int = 0) -> str:
+    """
+    CREATE INDEX statement for the configured ANN index type, using the cosine
+    opclass that matches the <=> operator used by the similarity search.
+    """
+    index_type = settings.VECTOR_INDEX_TYPE.lower()
+    expression, opclass = index_target()
+
+    if index_type == "hnsw":
+        return (
+            f"CREATE INDEX CONCURRENTLY {name} ON faqs "
+            f"USING hnsw ({expression} {opclass}) "
+            f"WITH (m = {int(settings.HNSW_M)}, "
+            f"ef_construction = {int(settings.HNSW_EF_CONSTRUCTION)})"
+        )
+
+    if index_type == "ivfflat":
+        lists = int(settings.IVFFLAT_LISTS)
+        if lists <= 0:
+            # pgvector's guidance: rows / 1000 up to 1M rows, sqrt(rows) above
+            if row_count <= 1_000_000:
+                lists = max(1, row_count // 1000)
+            else:
+                lists = int(math.sqrt(row_count))
+        return (
+            f"CREATE INDEX CONCURRENTLY {name} ON faqs "
+            f"USING ivfflat ({expression} {opclass}) WITH (lists = {lists})"
+        )
+
+    raise ValueError(f"Unknown vector index type: {settings.VECTOR_INDEX_TYPE}")
+
+
+async def index_matches_settings(db: AsyncSession) -> bool:
+    """
+    Whether the existing ANN index has the configured type and operator class.
+    """
+    result = await db.execute(
+        text("SELECT indexdef FROM pg_indexes WHERE indexname = :name"),
+        {"name": INDEX_NAME},
+    )
+    definition = result.scalar_one_or_none()
+    index_type = settings.VECTOR_INDEX_TYPE.lower()
+
+    if index_type == "none":
+        return definition is None
+    if definition is None:
+        return False
+    return f"USING {index_type}" in definition and index_target()[1] in definition
+
+
+async def drop_index(db: AsyncSession):
+    """
+    Drop the ANN index, for VECTOR_INDEX_TYPE=none.
+    """
+    await db.commit()
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    # DROP INDEX CONCURRENTLY can't run inside a transaction block
+    await raw_connection.driver_connection.execute(
+        f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}"
+    )
+    logger.info("Vector index disabled; dropped the index if there was one.")
+
+
+async def rebuild_index(db: AsyncSession):
+    """
+    Rebuild the ANN index on faqs.embedding, e.g. after a bulk load. The new
+    index is built concurrently next to the old one and swapped in, so
+    similarity queries keep using an index while it builds.
+    """
+    if settings.VECTOR_INDEX_TYPE.lower() == "none":
+        await drop_index(db)
+        return
+
+    result = await db.execute(
+        select(func.count()).select_from(FAQ).where(FAQ.embedding.isnot(None))
+    )
+    row_count = result.scalar_one()
+    await db.commit()
+
+    if row_count == 0 and settings.VECTOR_INDEX_TYPE.lower() == "ivfflat":
+        # IVFFlat lists are clustered from the rows present at build time
+        logger.info("No embedded FAQs yet; the IVFFlat index is built after embedding.")
+        return
+
+    new_name = f"{INDEX_NAME}_new"
+    statement = build_index_sql(new_name, row_count)
+    logger.info(f"Rebuilding vector index over {row_count} rows: {statement}")
+
+    # CREATE/DROP INDEX CONCURRENTLY can't run inside a transaction block, so
+    # these go straight to asyncpg, which runs each statement in autocommit mode
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    conn = raw_connection.driver_connection
+
+    await conn.execute(
+        f"SET maintenance_work_mem = '{settings.VECTOR_INDEX_MAINTENANCE_WORK_MEM}'"
+    )
+    # Drop a half-built index left behind by an interrupted rebuild
+    await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {new_name}")
+    await conn.execute(statement)
+    await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+    await conn.execute(f"ALTER INDEX {new_name} RENAME TO {INDEX_NAME}")
+    await conn.execute("RESET maintenance_work_mem")
+
+    logger.info("Vector index rebuilt.")
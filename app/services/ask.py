@@ -0,0 +1,285 @@
+import asyncio
+from typing import AsyncIterator, List, Optional, Tuple
+from app.db import AsyncSessionLocal
+from app.services.admission import Overloaded, search_limiter
+from app.services.cache import answer_cache, normalize_question
+from app.services.coalescing import SingleFlight
+from app.services.config import settings
+from app.services.embeddings import embedding_service
+from app.services.openai_client import openai_client, OPENAI_ERROR_ANSWER
+from app.services.query_log import query_log
+from app.services.similarity import similarity_service
+from app.utils.logger import logger
+from app.utils.metrics import record_cache, timed
+from app.utils.responses import faq_responses
+
+
+# Raised when a stage of the ask pipeline fails; `detail` is safe to show users
+class AskError(Exception):
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+# The question answering pipeline behind /ask-question
+class AskService:
+    def __init__(self):
+        # Concurrent requests for the same normalized question share one run
+        self.coalescer = SingleFlight()
+
+    async def answer(self, user_question: str) -> dict:
+        """
+        Answer a question from the local FAQ, the semantic answer cache or OpenAI.
+        Identical questions in flight at the same time share one embedding,
+        lookup and OpenAI call.
+        """
+        key = normalize_question(user_question)
+        embedding, response, candidates = await self.coalescer.do(
+            key, lambda: self._answer(user_question)
+        )
+        # Once per request, including the ones that joined a shared run
+        query_log.record(user_question, candidates, response["source"], embedding)
+        return response
+
+    async def lookup(
+        self, user_question: str
+    ) -> Tuple[List[float], Optional[dict], List[dict]]:
+        """
+        Embed the question and look it up in the local FAQ and the semantic
+        answer cache. Returns the embedding, the response (None when the
+        question has to go to OpenAI) and the FAQ candidates, best first.
+        """
+        key = normalize_question(user_question)
+        return await self.coalescer.do(
+            ("lookup", key), lambda: self._lookup(user_question)
+        )
+
+    async def _lookup(
+        self, user_question: str
+    ) -> Tuple[List[float], Optional[dict], List[dict]]:
+        # Generate the embedding for the user question, shared by the FAQ search
+        # and the semantic answer cache
+        with timed("embedding"):
+            embedding = await embedding_service.compute_single_embedding(
+                user_question
+            )
+
+        # Find the most similar question from the FAQ. The session is opened
+        # here rather than per request, so the execution shared by coalesced
+        # requests owns its connection
+        try:
+            async with search_limiter.slot():
+                with timed("vector_search"):
+                    async with AsyncSessionLocal() as db:
+                        candidates = await similarity_service.find_candidates(
+                            embedding, db, user_question
+                        )
+
+            best = candidates[0] if candidates else None
+            logger.debug("Similarity score: {}", best["similarity_score"] if best else 0.0)
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.error(f"Error during similarity search: {e}")
+            raise AskError("Internal Server Error during similarity search.")
+
+        return (
+            embedding,
+            self._resolve(embedding, best, best["similarity_score"] if best else 0.0),
+            candidates,
+        )
+
+    def _resolve(
+        self, embedding: List[float], faq_entry: Optional[dict], similarity_score
+    ) -> Optional[dict]:
+        """
+        Decide the response from the best FAQ match and the semantic answer cache.
+        Returns None when the question has to go to OpenAI.
+        """
+        # Make sure the similarity score and settings threshold are floats
+        # If not, convert them to floats
+        if not isinstance(similarity_score, float):
+            similarity_score = float(similarity_score)
+        if not isinstance(settings.SIMILARITY_THRESHOLD, float):
+            settings.SIMILARITY_THRESHOLD = float(settings.SIMILARITY_THRESHOLD)
+
+        # Check similarity and decide response source
+        if faq_entry is not None and similarity_score >= settings.SIMILARITY_THRESHOLD:
+            # Use the local FAQ answer, prepared once per FAQ
+            logger.debug("Answer sourced from local FAQ database.")
+            return faq_responses.get(faq_entry)
+
+        # If no similar question found or similarity below threshold, reuse a
+        # previously generated answer for a near-identical question if we have one
+        cached = answer_cache.get(embedding)
+        record_cache("answer", cached is not None)
+        if cached is not None:
+            logger.debug("Answer sourced from the semantic answer cache.")
+            return {
+                "source": "Cached LLM",
+                "matched_question": "N/A",
+                "answer": cached["answer"],
+            }
+
+        return None
+
+    def degraded_answer(self, faq_entry: Optional[dict]) -> Optional[dict]:
+        """
+        The best FAQ match, whatever its score, as the answer to serve when
+        OpenAI is saturated, or None when degraded mode is off.
+        """
+        if not settings.DEGRADED_MODE or faq_entry is None:
+            return None
+
+        logger.warning("OpenAI is saturated, answering with the best FAQ match.")
+        return {
+            "source": "Degraded FAQ",
+            "matched_question": faq_entry["question"],
+            "answer": faq_entry["answer"],
+        }
+
+    @staticmethod
+    def openai_key(user_question: str) -> tuple:
+        """
+        Coalescing key of the OpenAI call for a question, shared by single
+        and batch requests.
+        """
+        return ("openai", normalize_question(user_question))
+
+    async def _answer(
+        self, user_question: str
+    ) -> Tuple[List[float], dict, List[dict]]:
+        embedding, response, candidates = await self._lookup(user_question)
+        if response is None:
+            # Otherwise forward to OpenAI API, sharing the call with a batch
+            # asking the same question
+            response = await self.coalescer.do(
+                self.openai_key(user_question),
+                lambda: self._ask_openai_or_degrade(
+                    user_question, embedding, candidates[0] if candidates else None
+                ),
+            )
+
+        return embedding, response, candidates
+
+    async def _ask_openai_or_degrade(
+        self, user_question: str, embedding: List[float], faq_entry: Optional[dict]
+    ) -> dict:
+        try:
+            return await self._ask_openai(user_question, embedding)
+        except Overloaded:
+            degraded = self.degraded_answer(faq_entry)
+            if degraded is None:
+                raise
+            return degraded
+
+    async def _ask_openai(self, user_question: str, embedding: List[float]) -> dict:
+        try:
+            with timed("llm"):
+                answer = await openai_client.get_answer(user_question)
+            logger.debug("Answer sourced from OpenAI API.")
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching answer from OpenAI: {e}")
+            raise AskError("Internal Server Error fetching answer from OpenAI.")
+
+        if answer != OPENAI_ERROR_ANSWER:
+            answer_cache.set(user_question, embedding, answer)
+
+        return {"source": "OpenAI", "matched_question": "N/A", "answer": answer}
+
+    async def answer_batch(self, user_questions: List[str]) -> List[dict]:
+        """
+        Answer many questions at once: one embeddings call for the uncached
+        questions, one similarity query (or matrix product) for all of them,
+        and concurrent OpenAI calls for only the questions that need them.
+        """
+        with timed("embedding"):
+            embeddings = await embedding_service.compute_embeddings_batch(
+                user_questions
+            )
+
+        try:
+            async with search_limiter.slot():
+                with timed("vector_search"):
+                    async with AsyncSessionLocal() as db:
+                        candidate_lists = await similarity_service.find_top_k_batch(
+                            embeddings, db
+                        )
+                        for i, question in enumerate(user_questions):
+                            candidate_lists[i] = await similarity_service.rerank(
+                                question, candidate_lists[i], db
+                            )
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.error(f"Error during batch similarity search: {e}")
+            raise AskError("Internal Server Error during similarity search.")
+
+        responses: List[Optional[dict]] = []
+        best_matches: List[Optional[dict]] = []
+        for embedding, candidates in zip(embeddings, candidate_lists):
+            best = candidates[0] if candidates else None
+            best_matches.append(best)
+            responses.append(
+                self._resolve(
+                    embedding,
+                    best,
+                    best["similarity_score"] if best else 0.0,
+                )
+            )
+
+        # Send the rest to OpenAI concurrently, once per distinct question and
+        # shared with any single request for the same question in flight. The
+        # batch waits for OpenAI slots on its own, so a large batch doesn't
+        # overflow the shared queue
+        pending = [i for i, response in enumerate(responses) if response is None]
+        logger.debug(
+            "Batch of {} questions: {} answered locally, {} forwarded to OpenAI.",
+            len(user_questions),
+            len(user_questions) - len(pending),
+            len(pending),
+        )
+        batch_slots = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+
+        async def ask(i: int) -> dict:
+            async with batch_slots:
+                return await self.coalescer.do(
+                    self.openai_key(user_questions[i]),
+                    lambda: self._ask_openai_or_degrade(
+                        user_questions[i], embeddings[i], best_matches[i]
+                    ),
+                )
+
+        answers = await asyncio.gather(*(ask(i) for i in pending))
+        for i, answer in zip(pending, answers):
+            responses[i] = answer
+
+        for question, candidates, response, embedding in zip(
+            user_questions, candidate_lists, responses, embeddings
+        ):
+            query_log.record(question, candidates, response["source"], embedding)
+
+        return responses
+
+    async def stream_answer(
+        self, user_question: str, embedding: List[float]
+    ) -> AsyncIterator[str]:
+        """
+        Stream the OpenAI answer for a question that missed the FAQ and the
+        answer cache, caching the full answer once it completes.
+        """
+        parts = []
+        with timed("llm"):
+            async for token in openai_client.stream_answer(user_question):
+                parts.append(token)
+                yield token
+
+        answer = "".join(parts).strip()
+        if answer:
+            answer_cache.set(user_question, embedding, answer)
+
+
+# Instantiate the ask service
+ask_service = AskService()
@@ -0,0 +1,345 @@
+import asyncio
+import hashlib
+import sqlite3
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.config import settings
+from app.utils.logger import logger
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question so trivially different spellings share a cache entry.
+    """
+    return " ".join(question.lower().split())
+
+
+# A size-bounded LRU cache whose entries also expire after a fixed TTL
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float = 0):
+        self.maxsize = maxsize
+        # A TTL of zero (or less) means entries never expire
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = item
+        if expires_at and expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else 0
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+# A persistent SQLite tier for the embedding cache, so it survives restarts
+class SQLiteEmbeddingStore:
+    """
+    The connection is only used from one dedicated thread: lookups are awaited
+    from the event loop without blocking it, and writes are queued on that
+    thread and committed once per batch, so a slow fsync never stalls requests.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl: float = 0):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._writes = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-cache")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                embedding BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_created_at ON embeddings (created_at)"
+        )
+        self._conn.commit()
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, array]:
+        """
+        Look up several keys on the cache thread; missing and expired keys are left out.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._get_many, list(keys)
+        )
+
+    def set_many(self, items: Sequence[Tuple[str, array]]):
+        """
+        Queue embeddings to be written on the cache thread in one transaction.
+        """
+        self._executor.submit(self._set_many, list(items))
+
+    def _get_many(self, keys: List[str]) -> Dict[str, array]:
+        found = {}
+        for key in keys:
+            row = self._conn.execute(
+                "SELECT embedding, created_at FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                continue
+
+            blob, created_at = row
+            if self.ttl > 0 and created_at + self.ttl < time.time():
+                continue
+
+            embedding = array("f")
+            embedding.frombytes(blob)
+            found[key] = embedding
+        return found
+
+    def _set_many(self, items: List[Tuple[str, array]]):
+        try:
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, created_at) VALUES (?, ?, ?)",
+                [(key, embedding.tobytes(), now) for key, embedding in items],
+            )
+            self._conn.commit()
+
+            # Prune the oldest entries every so often instead of on each write
+            previous, self._writes = self._writes, self._writes + len(items)
+            if previous // 1000 != self._writes // 1000:
+                self._prune()
+        except Exception as e:
+            logger.error(f"Error writing the persistent embedding cache: {e}")
+
+    def _prune(self):
+        if self.ttl > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+        self._conn.execute(
+            """
+            DELETE FROM embeddings WHERE key IN (
+                SELECT key FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+        self._conn.commit()
+
+
+# Two-tier cache mapping (embeddings model, normalized question) to an embedding
+class EmbeddingCache:
+    def __init__(self):
+        self.memory = TTLCache(
+            settings.EMBEDDING_CACHE_SIZE, settings.EMBEDDING_CACHE_TTL
+        )
+        self.store = None
+        if settings.EMBEDDING_CACHE_PATH:
+            try:
+                self.store = SQLiteEmbeddingStore(
+                    settings.EMBEDDING_CACHE_PATH,
+                    settings.EMBEDDING_CACHE_DISK_MAX_ENTRIES,
+                    settings.EMBEDDING_CACHE_TTL,
+                )
+            except Exception as e:
+                logger.error(f"Error opening the persistent embedding cache: {e}")
+
+    @staticmethod
+    def key(question: str) -> str:
+        normalized = normalize_question(question)
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"{settings.EMBEDDING_SPACE}:{digest}"
+
+    async def get(self, question: str) -> Optional[List[float]]:
+        return (await self.get_many([question]))[0]
+
+    async def get_many(self, questions: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Cached embeddings of the questions (None when missing), from memory
+        first and from the persistent store for the rest, in one lookup.
+        """
+        keys = [self.key(question) for question in questions]
+        embeddings = [self.memory.get(key) for key in keys]
+
+        missing = [key for key, embedding in zip(keys, embeddings) if embedding is None]
+        if missing and self.store is not None:
+            try:
+                found = await self.store.get_many(missing)
+            except Exception as e:
+                logger.error(f"Error reading the persistent embedding cache: {e}")
+                found = {}
+            for i, key in enumerate(keys):
+                if embeddings[i] is None and key in found:
+                    embeddings[i] = found[key]
+                    self.memory.set(key, found[key])
+
+        return [embedding.tolist() if embedding is not None else None for embedding in embeddings]
+
+    def set(self, question: str, embedding: List[float]):
+        self.set_many([(question, embedding)])
+
+    def set_many(self, items: Sequence[Tuple[str, List[float]]]):
+        """
+        Cache embeddings in memory right away; the persistent store writes
+        them in the background, committing once for the whole batch.
+        """
+        # Store compact float32 arrays rather than lists of Python floats
+        values = [(self.key(question), array("f", embedding)) for question, embedding in items]
+        for key, value in values:
+            self.memory.set(key, value)
+
+        if self.store is not None and values:
+            try:
+                self.store.set_many(values)
+            except Exception as e:
+                logger.error(f"Error writing the persistent embedding cache: {e}")
+
+
+# Semantic cache of LLM answers, looked up by cosine similarity of question embeddings
+class SemanticAnswerCache:
+    def __init__(self, capacity: int, threshold: float, ttl: float = 0):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        # Allocated on first insert, once the embedding dimension is known
+        self._matrix: Optional[np.ndarray] = None
+        self._questions: List[Optional[str]] = [None] * capacity
+        self._answers: List[Optional[str]] = [None] * capacity
+        # An expiry of zero marks an empty slot
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._expires > time.monotonic()))
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if vector.size == 0 or norm == 0:
+            return None
+        return vector / norm
+
+    def get(self, embedding) -> Optional[dict]:
+        """
+        Return the cached answer whose question is most similar to the embedding,
+        if that similarity reaches the cache threshold.
+        """
+        vector = self._normalize(embedding) if self._matrix is not None else None
+        if vector is None or vector.shape[0] != self._matrix.shape[1]:
+            self.misses += 1
+            return None
+
+        now = time.monotonic()
+        scores = self._matrix @ vector
+        scores[self._expires <= now] = -np.inf
+
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        self._last_used[best] = now
+        self.hits += 1
+        return {
+            "question": self._questions[best],
+            "answer": self._answers[best],
+            "similarity_score": float(scores[best]),
+        }
+
+    def set(self, question: str, embedding, answer: str):
+        """
+        Store an answer, reusing an empty or expired slot before evicting the
+        least recently used entry.
+        """
+        vector = self._normalize(embedding)
+        if self.capacity <= 0 or vector is None:
+            return
+
+        if self._matrix is None:
+            self._matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+        elif vector.shape[0] != self._matrix.shape[1]:
+            return
+
+        now = time.monotonic()
+        free = np.flatnonzero(self._expires <= now)
+        slot = int(free[0]) if free.size else int(np.argmin(self._last_used))
+
+        self._matrix[slot] = vector
+        self._questions[slot] = question
+        self._answers[slot] = answer
+        self._expires[slot] = now + self.ttl if self.ttl > 0 else np.inf
+        self._last_used[slot] = now
+
+    def invalidate_similar(self, embeddings, threshold: float) -> int:
+        """
+        Drop the answers cached for questions at least `threshold` similar to
+        any of the embeddings, e.g. of FAQs that were just added or edited.
+        Returns the number of dropped entries.
+        """
+        if self._matrix is None or len(embeddings) == 0:
+            return 0
+        vectors = [self._normalize(embedding) for embedding in embeddings]
+        vectors = [v for v in vectors if v is not None and v.shape[0] == self._matrix.shape[1]]
+        if not vectors:
+            return 0
+
+        scores = (self._matrix @ np.asarray(vectors).T).max(axis=1)
+        stale = (scores >= threshold) & (self._expires > time.monotonic())
+        for slot in np.flatnonzero(stale):
+            self._questions[slot] = None
+            self._answers[slot] = None
+        self._expires[stale] = 0
+        return int(stale.sum())
+
+    def clear(self):
+        self._expires[:] = 0
+        self._questions = [None] * self.capacity
+        self._answers = [None] * self.capacity
+
+
+# Instantiate the embedding cache
+embedding_cache = EmbeddingCache()
+
+# Instantiate the semantic answer cache for the OpenAI fallback path
+answer_cache = SemanticAnswerCache(
+    settings.ANSWER_CACHE_SIZE,
+    settings.ANSWER_CACHE_THRESHOLD,
+    settings.ANSWER_CACHE_TTL,
+)
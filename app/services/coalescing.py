@@ -0,0 +1,60 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+from app.utils.metrics import COALESCED_REQUESTS, add_timings, start_request_timings
+
+T = TypeVar("T")
+
+
+# Single-flight coalescing: concurrent calls with the same key share one execution
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # Calls that started a new execution vs calls that joined one in flight
+        self.leaders = 0
+        self.coalesced = 0
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `fn` for the key, or wait for the execution already running for it.
+        The shared execution is shielded, so a caller that gets cancelled (e.g.
+        a client disconnect) doesn't cancel it for the other waiters. Its stage
+        timings are added to every caller's, the ones that joined it included.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(self._run(fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+            COALESCED_REQUESTS.inc()
+
+        result, timings = await asyncio.shield(task)
+        add_timings(timings)
+        return result
+
+    @staticmethod
+    async def _run(fn: Callable[[], Awaitable[T]]) -> Tuple[T, Dict[str, float]]:
+        # The task runs in a copy of the leader's context: time it on its own
+        timings = start_request_timings()
+        return await fn(), timings
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "inflight": self.inflight,
+        }
@@ -15,10 +15,219 @@ class Settings:
 
     # OpenAI API key, loaded from environment variables
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
+    # Embeddings provider: "openai" (API) or "local" (sentence-transformers model on the CPU)
+    EMBEDDING_PROVIDER: str = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+    # Default model and native dimensions of each provider
+    _PROVIDER_DEFAULTS = {
+        "openai": ("text-embedding-3-small", 1536),
+        "local": ("sentence-transformers/all-MiniLM-L6-v2", 384),
+    }
+    _DEFAULT_MODEL, _DEFAULT_DIMENSIONS = _PROVIDER_DEFAULTS.get(
+        EMBEDDING_PROVIDER, _PROVIDER_DEFAULTS["openai"]
+    )
     # The model to be used for generating embeddings
-    EMBEDDINGS_MODEL: str = os.getenv("EMBEDDINGS_MODEL", "text-embedding-3-small")
+    EMBEDDINGS_MODEL: str = os.getenv("EMBEDDINGS_MODEL", _DEFAULT_MODEL)
+    # Embedding dimensions, which size faqs.embedding; text-embedding-3 and
+    # Matryoshka-trained local models return shortened embeddings on request
+    EMBEDDING_DIMENSIONS: int = int(os.getenv("EMBEDDING_DIMENSIONS", _DEFAULT_DIMENSIONS))
+    # Embedding space (model and dimensions) recorded with stored and cached embeddings
+    EMBEDDING_SPACE: str = (
+        EMBEDDINGS_MODEL
+        if EMBEDDING_DIMENSIONS == _DEFAULT_DIMENSIONS
+        else f"{EMBEDDINGS_MODEL}@{EMBEDDING_DIMENSIONS}"
+    )
+    # Torch threads used by the local model (0 splits the CPU cores between the workers)
+    LOCAL_EMBEDDING_THREADS: int = int(os.getenv("LOCAL_EMBEDDING_THREADS", 0))
+    # Maximum number of texts encoded together by the local model
+    LOCAL_EMBEDDING_BATCH_SIZE: int = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", 64))
     # Threshold for similarity comparison
     SIMILARITY_THRESHOLD: float = os.getenv("SIMILARITY_THRESHOLD", 0.7)
+    # Number of gunicorn worker processes (0 starts one per CPU core)
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", 0))
+    # Minimum level of application log records
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # Hand log records to a background thread instead of writing on the event loop
+    LOG_ENQUEUE: bool = os.getenv("LOG_ENQUEUE", "true").lower() in ("1", "true", "yes")
+    # Write log records as JSON lines, including structured access log fields
+    LOG_JSON: bool = os.getenv("LOG_JSON", "false").lower() in ("1", "true", "yes")
+    # Size at which the log file is rotated
+    LOG_FILE_ROTATION: str = os.getenv("LOG_FILE_ROTATION", "100 MB")
+    # Share of requests written to the access log (errors and slow requests always are)
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", 1.0))
+    # Requests slower than this many milliseconds are always written to the access log
+    LOG_SLOW_REQUEST_MS: float = float(os.getenv("LOG_SLOW_REQUEST_MS", 1000))
+    # Log every SQL statement issued by SQLAlchemy (for debugging only)
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+    # Database connections kept open per worker, and extra ones opened under load
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    # Seconds to wait for a free pooled connection before failing
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    # Seconds after which a pooled connection is replaced (-1 never recycles)
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    # Check a pooled connection is alive before handing it out
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    # Seconds the readiness probe waits for the database to answer
+    READINESS_TIMEOUT: float = float(os.getenv("READINESS_TIMEOUT", 2))
+    # Seconds between attempts to load the indexes when the database is down at startup
+    WARM_UP_RETRY_INTERVAL: float = float(os.getenv("WARM_UP_RETRY_INTERVAL", 5))
+    # Prepared statements cached per connection (0 disables the cache)
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+
+    # Backend used for similarity search: "pgvector" (database) or "memory" (in-process)
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "pgvector")
+    # Precision of the vector search: "float32" (exact), "float16" (half the index
+    # memory) or "binary" (1 bit per dimension, shortlisted candidates rescored exactly).
+    # With the memory backend, float16 only saves memory: NumPy has no fast half
+    # precision matmul, so every search upcasts the matrix and is several times slower;
+    # binary only speeds up the scan, as the float32 matrix is kept for rescoring
+    VECTOR_PRECISION: str = os.getenv("VECTOR_PRECISION", "float32").lower()
+    # With binary precision, k times this many candidates are rescored at full precision
+    VECTOR_RESCORE_FACTOR: int = int(os.getenv("VECTOR_RESCORE_FACTOR", 10))
+    # Memory-mapped index snapshot file shared by the workers of a host
+    VECTOR_INDEX_PATH: str = os.getenv("VECTOR_INDEX_PATH", "")
+    # Precision of the embeddings in the snapshot: "float32" or "float16" (half the
+    # size and page cache, but searched several times slower, see VECTOR_PRECISION)
+    VECTOR_SNAPSHOT_DTYPE: str = os.getenv("VECTOR_SNAPSHOT_DTYPE", "float32")
+    # Add a Server-Timing header with per-stage durations to question responses
+    SERVER_TIMING_HEADER: bool = os.getenv("SERVER_TIMING_HEADER", "false").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    # Maximum number of questions accepted by the batch endpoint
+    BATCH_MAX_QUESTIONS: int = int(os.getenv("BATCH_MAX_QUESTIONS", 100))
+    # Number of nearest FAQ candidates fetched before the threshold decision
+    SIMILARITY_TOP_K: int = int(os.getenv("SIMILARITY_TOP_K", 5))
+    # Rerank the candidates with an in-memory BM25 index over the FAQ questions
+    LEXICAL_RERANK: bool = os.getenv("LEXICAL_RERANK", "false").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    # Weight of the BM25 score when combined with the vector score
+    LEXICAL_WEIGHT: float = float(os.getenv("LEXICAL_WEIGHT", 0.3))
+    # Follow FAQ inserts, edits and deletions and update the indexes and caches in place
+    FAQ_CHANGE_FEED: bool = os.getenv("FAQ_CHANGE_FEED", "true").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    # Seconds between change feed polls, in case a notification was missed
+    FAQ_REFRESH_INTERVAL: float = float(os.getenv("FAQ_REFRESH_INTERVAL", 30))
+    # Seconds the change feed reads back past its watermark for late commits
+    FAQ_REFRESH_LAG: float = float(os.getenv("FAQ_REFRESH_LAG", 10))
+    # Embed new and edited FAQs from the running app (one process per database)
+    FAQ_AUTO_EMBED: bool = os.getenv("FAQ_AUTO_EMBED", "true").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+
+    # ANN index on faqs.embedding: "hnsw", "ivfflat" or "none"
+    VECTOR_INDEX_TYPE: str = os.getenv("VECTOR_INDEX_TYPE", "hnsw")
+    # HNSW build parameters: max connections per node and build candidate list size
+    HNSW_M: int = int(os.getenv("HNSW_M", 16))
+    HNSW_EF_CONSTRUCTION: int = int(os.getenv("HNSW_EF_CONSTRUCTION", 64))
+    # Number of IVFFlat lists (0 derives it from the row count)
+    IVFFLAT_LISTS: int = int(os.getenv("IVFFLAT_LISTS", 0))
+    # Query-time HNSW candidate list size (higher = better recall, slower)
+    HNSW_EF_SEARCH: int = int(os.getenv("HNSW_EF_SEARCH", 40))
+    # Query-time number of IVFFlat lists probed (higher = better recall, slower)
+    IVFFLAT_PROBES: int = int(os.getenv("IVFFLAT_PROBES", 10))
+    # Memory available to Postgres while building the vector index
+    VECTOR_INDEX_MAINTENANCE_WORK_MEM: str = os.getenv(
+        "VECTOR_INDEX_MAINTENANCE_WORK_MEM", "512MB"
+    )
+
+    # Timeout in seconds for a single OpenAI chat completion
+    OPENAI_TIMEOUT: float = float(os.getenv("OPENAI_TIMEOUT", 30))
+    # Timeout in seconds for a single embeddings request
+    EMBEDDING_TIMEOUT: float = float(os.getenv("EMBEDDING_TIMEOUT", 10))
+    # Maximum number of concurrent OpenAI chat completions per worker
+    OPENAI_MAX_CONCURRENCY: int = int(os.getenv("OPENAI_MAX_CONCURRENCY", 16))
+    # Maximum number of concurrent embeddings requests per worker
+    EMBEDDING_MAX_CONCURRENCY: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 32))
+    # Requests allowed to wait for a busy stage, beyond its concurrency limit;
+    # further requests are rejected with 503 right away
+    EMBEDDING_QUEUE_SIZE: int = int(os.getenv("EMBEDDING_QUEUE_SIZE", 64))
+    OPENAI_QUEUE_SIZE: int = int(os.getenv("OPENAI_QUEUE_SIZE", 32))
+    # Maximum number of concurrent similarity searches per worker, and requests queued for one
+    SEARCH_MAX_CONCURRENCY: int = int(
+        os.getenv("SEARCH_MAX_CONCURRENCY", DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    )
+    SEARCH_QUEUE_SIZE: int = int(os.getenv("SEARCH_QUEUE_SIZE", 64))
+    # Seconds a queued request waits for a stage before it is rejected with 503
+    QUEUE_TIMEOUT: float = float(os.getenv("QUEUE_TIMEOUT", 5))
+    # Answer with the best FAQ match, even below the threshold, when OpenAI is saturated
+    DEGRADED_MODE: bool = os.getenv("DEGRADED_MODE", "false").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    # Question requests allowed per API token and minute per worker (0 disables the limit)
+    RATE_LIMIT_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_PER_MINUTE", 0))
+    # Requests an API token may send in a burst before the per-minute rate applies
+    RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", 20))
+    # Size of the HTTP connection pool shared by the OpenAI clients
+    OPENAI_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", 64))
+
+    # Number of FAQ questions sent in one embeddings API call when embedding in bulk
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", 256))
+    # Number of bulk embedding batches sent to the API concurrently
+    EMBEDDING_BATCH_CONCURRENCY: int = int(os.getenv("EMBEDDING_BATCH_CONCURRENCY", 4))
+    # Retries with exponential backoff for a rate-limited bulk embedding batch
+    EMBEDDING_MAX_RETRIES: int = int(os.getenv("EMBEDDING_MAX_RETRIES", 6))
+
+    # Maximum number of question embeddings kept in the in-memory cache (0 disables it)
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+    # Seconds before a cached embedding expires (0 keeps entries until evicted)
+    EMBEDDING_CACHE_TTL: float = float(os.getenv("EMBEDDING_CACHE_TTL", 86400))
+    # Optional SQLite file for a persistent embedding cache shared across restarts
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "")
+    # Maximum number of embeddings kept in the persistent cache
+    EMBEDDING_CACHE_DISK_MAX_ENTRIES: int = int(
+        os.getenv("EMBEDDING_CACHE_DISK_MAX_ENTRIES", 1000000)
+    )
+
+    # Local FAQ answers kept serialized, ready to send (0 serializes every response)
+    FAQ_RESPONSE_CACHE_SIZE: int = int(os.getenv("FAQ_RESPONSE_CACHE_SIZE", 10000))
+    # Seconds clients may reuse a local FAQ answer (sent as Cache-Control: private)
+    FAQ_RESPONSE_MAX_AGE: int = int(os.getenv("FAQ_RESPONSE_MAX_AGE", 60))
+    # Seconds browsers and CDNs may cache the main page before revalidating its ETag
+    PAGE_MAX_AGE: int = int(os.getenv("PAGE_MAX_AGE", 300))
+    # Responses from this many bytes on are gzipped for clients accepting it
+    GZIP_MINIMUM_SIZE: int = int(os.getenv("GZIP_MINIMUM_SIZE", 1024))
+    # Gzip compression level (1 fastest, 9 smallest)
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", 6))
+
+    # Maximum number of OpenAI answers kept in the semantic answer cache (0 disables it)
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", 2048))
+    # Minimum similarity for a new question to reuse a cached OpenAI answer
+    ANSWER_CACHE_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+    # Seconds before a cached OpenAI answer expires (0 keeps entries until evicted)
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", 3600))
+
+    # Query log of every question, its candidates, source and stage timings:
+    # "off", "postgres" (the query_log table) or "parquet" (files in QUERY_LOG_PATH)
+    QUERY_LOG: str = os.getenv("QUERY_LOG", "off").lower()
+    # Directory of the Parquet query log files
+    QUERY_LOG_PATH: str = os.getenv("QUERY_LOG_PATH", "query_log")
+    # Entries waiting to be written per worker; further entries are dropped
+    QUERY_LOG_QUEUE_SIZE: int = int(os.getenv("QUERY_LOG_QUEUE_SIZE", 10000))
+    # Entries written per batch, and the seconds between writes
+    QUERY_LOG_BATCH_SIZE: int = int(os.getenv("QUERY_LOG_BATCH_SIZE", 500))
+    QUERY_LOG_FLUSH_INTERVAL: float = float(os.getenv("QUERY_LOG_FLUSH_INTERVAL", 5))
+    # Also store the question embeddings, so the log can be replayed against other index settings
+    QUERY_LOG_EMBEDDINGS: bool = os.getenv("QUERY_LOG_EMBEDDINGS", "false").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
 
 
 # Initialize a settings instance to be used across the application
@@ -1,20 +1,100 @@
-from typing import List
-from langchain_openai.embeddings import OpenAIEmbeddings
-from langchain.schema import Document
+import asyncio
+import random
+import time
+from typing import List, Optional, Sequence
 from app.models import FAQ
+from app.services.admission import Overloaded, embedding_limiter
+from app.services.cache import embedding_cache
+from app.services.http_client import openai_api
+from app.services.local_embeddings import LocalEmbeddings
 from app.services.config import settings
 from app.utils.logger import logger
+from app.utils.metrics import record_cache
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update
+from sqlalchemy import and_, or_, update
 
 
-class EmbeddingService:
-    def __init__(self):
-        # Initialize OpenAI embedding model
-        self.embeddings_model = OpenAIEmbeddings(
-            openai_api_key=settings.OPENAI_API_KEY, model=settings.EMBEDDINGS_MODEL
+def retryable_errors() -> tuple:
+    """
+    OpenAI errors worth retrying with backoff when embedding in bulk.
+    """
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+
+# Embeddings straight on the OpenAI SDK
+class OpenAIEmbeddingModel:
+    """
+    Exposes `aembed_query` and `aembed_documents` (the interface shared with
+    the local model and the benchmark fakes) without the LangChain import tree.
+    """
+
+    def __init__(self, model: str, dimensions: int):
+        self.model = model
+        # Only text-embedding-3 models accept a dimensions parameter
+        self.dimensions = dimensions if model.startswith("text-embedding-3") else None
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        request = {"model": self.model, "input": list(texts)}
+        if self.dimensions is not None:
+            request["dimensions"] = self.dimensions
+        response = await openai_api().embeddings.create(**request)
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def create_embeddings_model():
+    """
+    Build the embeddings model of the configured EMBEDDING_PROVIDER.
+    """
+    if settings.EMBEDDING_PROVIDER == "local":
+        return LocalEmbeddings(
+            settings.EMBEDDINGS_MODEL,
+            settings.EMBEDDING_DIMENSIONS,
+            threads=settings.LOCAL_EMBEDDING_THREADS,
+            batch_size=settings.LOCAL_EMBEDDING_BATCH_SIZE,
         )
+    if settings.EMBEDDING_PROVIDER != "openai":
+        raise ValueError(f"Unknown embedding provider: {settings.EMBEDDING_PROVIDER}")
+
+    return OpenAIEmbeddingModel(settings.EMBEDDINGS_MODEL, settings.EMBEDDING_DIMENSIONS)
+
+
+class EmbeddingService:
+    def __init__(self, embeddings_model=None):
+        # The configured embeddings model is created on first use, unless another
+        # model exposing the same interface is given (e.g. a benchmark fake)
+        self._embeddings_model = embeddings_model
+
+    @property
+    def embeddings_model(self):
+        if self._embeddings_model is None:
+            self._embeddings_model = create_embeddings_model()
+        return self._embeddings_model
+
+    @embeddings_model.setter
+    def embeddings_model(self, embeddings_model):
+        self._embeddings_model = embeddings_model
+
+    async def load_model(self):
+        """
+        Create the embeddings model and load a local one ahead of the first
+        request; for the OpenAI model this creates the API client.
+        """
+        load = getattr(self.embeddings_model, "aload", None)
+        if load is not None:
+            await load()
+        elif isinstance(self.embeddings_model, OpenAIEmbeddingModel):
+            openai_api()
 
     async def load_faq_data_from_db(self, db) -> List[FAQ]:
         """
@@ -37,58 +117,197 @@ class EmbeddingService:
 
     async def compute_single_embedding(self, question: str):
         """
-        Compute the embedding for a single question using the OpenAI embeddings model.
+        Compute the embedding for a single question using the embeddings model.
+        Repeated questions are served from the embedding cache.
         """
+        embedding = await embedding_cache.get(question)
+        record_cache("embedding", embedding is not None)
+        if embedding is not None:
+            logger.debug("Embedding cache hit for the question: {}", question)
+            return embedding
+
         try:
-            embedding = self.embeddings_model.embed_query(question)
-            logger.info(f"Computed embedding for the question: {question}")
+            async with embedding_limiter.slot():
+                embedding = await asyncio.wait_for(
+                    self.embeddings_model.aembed_query(question),
+                    timeout=settings.EMBEDDING_TIMEOUT,
+                )
+            logger.debug("Computed embedding for the question: {}", question)
+            embedding_cache.set(question, embedding)
             return embedding
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error(f"Error computing embedding: {e}")
             return []
 
-    async def compute_embeddings(self, db: AsyncSession):
+    async def compute_embeddings_batch(self, questions: List[str]) -> List[List[float]]:
+        """
+        Compute embeddings for several questions, serving cached ones from the
+        embedding cache and embedding the rest in a single API call.
+        Questions whose embedding fails get an empty list.
+        """
+        embeddings = await embedding_cache.get_many(questions)
+        for embedding in embeddings:
+            record_cache("embedding", embedding is not None)
+
+        # Embed each distinct uncached question once
+        missing = list(
+            dict.fromkeys(
+                question
+                for question, embedding in zip(questions, embeddings)
+                if embedding is None
+            )
+        )
+        computed = {}
+        if missing:
+            try:
+                async with embedding_limiter.slot():
+                    vectors = await asyncio.wait_for(
+                        self.embeddings_model.aembed_documents(missing),
+                        timeout=settings.EMBEDDING_TIMEOUT,
+                    )
+                logger.debug("Computed embeddings for {} questions.", len(missing))
+                embedding_cache.set_many(list(zip(missing, vectors)))
+                computed = dict(zip(missing, vectors))
+            except Overloaded:
+                raise
+            except Exception as e:
+                logger.error(f"Error computing batch embeddings: {e}")
+
+        return [
+            embedding if embedding is not None else computed.get(question, [])
+            for question, embedding in zip(questions, embeddings)
+        ]
+
+    async def _embed_batch(self, questions: List[str]) -> List[List[float]]:
+        """
+        Embed one batch of questions, backing off exponentially on rate limits
+        and transient API errors.
+        """
+        for attempt in range(settings.EMBEDDING_MAX_RETRIES + 1):
+            try:
+                return await self.embeddings_model.aembed_documents(questions)
+            except retryable_errors() as e:
+                if attempt == settings.EMBEDDING_MAX_RETRIES:
+                    raise
+
+                # Honor the server's Retry-After hint when it sends one
+                delay = min(60.0, 2**attempt) + random.uniform(0, 1)
+                response = getattr(e, "response", None)
+                retry_after = (
+                    response.headers.get("retry-after") if response is not None else None
+                )
+                if retry_after:
+                    try:
+                        delay = max(delay, float(retry_after))
+                    except ValueError:
+                        pass
+
+                logger.warning(
+                    f"Embedding batch failed ({type(e).__name__}), retrying in {delay:.1f}s."
+                )
+                await asyncio.sleep(delay)
+
+    async def compute_embeddings(
+        self,
+        db: AsyncSession,
+        reembed: bool = False,
+        faq_ids: Optional[Sequence[int]] = None,
+    ):
         """
         Compute embeddings for the FAQ questions and save them directly into the database.
+
+        Only rows without an embedding, with one from a different embeddings model,
+        or whose question was edited since it was embedded are processed. Rows are
+        read in keyset-paginated pages, each page is embedded as several concurrent
+        API batches and written back with a single bulk UPDATE that is committed on
+        its own, so an interrupted run resumes where it stopped.
+        Passing `reembed=True` marks every row stale first to force a full re-embed.
+        Passing `faq_ids` only considers those FAQs.
+        Returns the number of FAQs embedded.
         """
 
         # Check if the connection is closed
         if not db.is_active:
             logger.error(f"The connection is not active: {db.is_active}")
-            return
+            return 0
+
+        total = 0
 
         try:
-            faqs = await self.load_faq_data_from_db(db)
-            logger.info(f"Computing embeddings for {len(faqs)} FAQ entries.")
-            if not faqs:
-                logger.error("No FAQ data found for embedding.")
-                return
-
-            documents = []
-            for faq in faqs:
-                doc = Document(page_content=faq.question, metadata={"faq_entry": faq})
-                documents.append(doc)
-
-            # Compute embeddings for all FAQ questions
-            embeddings = self.embeddings_model.embed_documents(
-                [faq.question for faq in faqs]
+            if reembed:
+                # Keep the old vectors for serving until each row is replaced
+                await db.execute(update(FAQ).values(embedding_model=None))
+                await db.commit()
+
+            stale = or_(
+                FAQ.embedding.is_(None),
+                FAQ.embedding_model.is_distinct_from(settings.EMBEDDING_SPACE),
+                FAQ.embedding_hash.is_distinct_from(FAQ.question_hash),
             )
+            if faq_ids is not None:
+                stale = and_(stale, FAQ.id.in_(faq_ids))
+            batch_size = settings.EMBEDDING_BATCH_SIZE
+            page_size = batch_size * settings.EMBEDDING_BATCH_CONCURRENCY
+
+            last_id = 0
+            started = time.perf_counter()
 
-            # Update the FAQ entries with the computed embeddings
-            for faq, embedding in zip(faqs, embeddings):
-                faq.embedding = embedding
+            while True:
+                result = await db.execute(
+                    select(FAQ.id, FAQ.question, FAQ.question_hash)
+                    .where(stale, FAQ.id > last_id)
+                    .order_by(FAQ.id)
+                    .limit(page_size)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                # Embed the page as concurrent API batches
+                batches = [
+                    rows[i : i + batch_size] for i in range(0, len(rows), batch_size)
+                ]
+                embeddings = await asyncio.gather(
+                    *(self._embed_batch([row.question for row in b]) for b in batches)
+                )
+
+                # Write the page back in one executemany UPDATE and commit it
                 await db.execute(
-                    update(FAQ).where(FAQ.id == faq.id).values(embedding=embedding)
+                    update(FAQ),
+                    [
+                        {
+                            "id": row.id,
+                            "embedding": embedding,
+                            "embedding_model": settings.EMBEDDING_SPACE,
+                            # The question this embedding is for; an edit made
+                            # meanwhile leaves the row stale
+                            "embedding_hash": row.question_hash,
+                        }
+                        for batch, batch_embeddings in zip(batches, embeddings)
+                        for row, embedding in zip(batch, batch_embeddings)
+                    ],
                 )
+                await db.commit()
 
-            # Commit the updates to the database
-            await db.commit()
-            logger.info(
-                f"Embeddings computed and stored in the database for {len(faqs)} FAQs."
-            )
+                total += len(rows)
+                elapsed = time.perf_counter() - started
+                logger.info(
+                    f"Embedded {total} FAQs so far ({total / elapsed:.1f} rows/sec)."
+                )
+
+            if total == 0:
+                logger.info("All FAQ embeddings are up to date.")
+            else:
+                logger.info(
+                    f"Embeddings computed and stored in the database for {total} FAQs."
+                )
         except Exception as e:
             logger.error(f"Error computing embeddings: {e}")
             await db.rollback()  # Rollback in case of error
+        return total
 
 
 embedding_service = EmbeddingService()
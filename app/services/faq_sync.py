@@ -0,0 +1,231 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, select
+
+from app.db import AsyncSessionLocal, engine
+from app.models import FAQ, FAQDeletion
+from app.services.cache import answer_cache
+from app.services.config import settings
+from app.services.embeddings import embedding_service
+from app.services.lexical import lexical_index
+from app.services.vector_index import vector_index
+from app.utils.logger import logger
+from app.utils.responses import faq_responses
+
+# Channel notified by the faqs triggers in init.sql
+CHANNEL = "faq_changes"
+# Session advisory lock held by the one process that embeds changed FAQs
+EMBEDDER_LOCK_ID = 0x41534B4D
+# Seconds to let a burst of notifications settle into a single refresh
+DEBOUNCE_SECONDS = 0.2
+# Seconds before retrying after the listener connection failed
+RECONNECT_SECONDS = 5
+# Deletion records older than this are pruned by the embedder
+DELETIONS_RETENTION = timedelta(days=1)
+
+
+# Keeps the in-process indexes and caches in sync with the faqs table
+class FAQChangeFeed:
+    """
+    Every app process listens for the NOTIFY sent by the faqs triggers (and
+    polls every FAQ_REFRESH_INTERVAL seconds in case a notification was missed),
+    then reads the rows changed since its watermark and applies them in place:
+    - the in-memory vector index and the BM25 index are updated
+    - cached OpenAI answers for questions close to a changed FAQ are dropped
+    One process, the holder of an advisory lock, embeds new and edited FAQs;
+    writing their embeddings notifies every process again.
+    """
+
+    def __init__(self):
+        self.watermark: Optional[datetime] = None
+        self.is_embedder = False
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # updated_at of the rows applied within the overlap window, so rows
+        # fetched again are not re-applied
+        self._applied: Dict[int, datetime] = {}
+
+    def start(self, watermark: Optional[datetime] = None):
+        """
+        Start following changes made after `watermark` (by default, from now on).
+        """
+        self.watermark = watermark
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _notify(self, connection, pid, channel, payload):
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                # A dedicated pooled connection, held for the life of the feed
+                async with engine.connect() as connection:
+                    raw_connection = await connection.get_raw_connection()
+                    listener = raw_connection.driver_connection
+                    await listener.add_listener(CHANNEL, self._notify)
+                    try:
+                        await self._follow(listener)
+                    finally:
+                        if self.is_embedder:
+                            await listener.execute(
+                                f"SELECT pg_advisory_unlock({EMBEDDER_LOCK_ID})"
+                            )
+                            self.is_embedder = False
+                        await listener.remove_listener(CHANNEL, self._notify)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"FAQ change feed failed, reconnecting: {e}")
+                await asyncio.sleep(RECONNECT_SECONDS)
+
+    async def _follow(self, listener):
+        while True:
+            if settings.FAQ_AUTO_EMBED and not self.is_embedder:
+                self.is_embedder = await listener.fetchval(
+                    f"SELECT pg_try_advisory_lock({EMBEDDER_LOCK_ID})"
+                )
+                if self.is_embedder:
+                    logger.info("This process embeds new and edited FAQs.")
+
+            await self.refresh()
+
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=settings.FAQ_REFRESH_INTERVAL
+                )
+                await asyncio.sleep(DEBOUNCE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def refresh(self):
+        """
+        Apply the FAQ changes made since the watermark, then embed stale FAQs
+        if this process is the embedder.
+        """
+        async with AsyncSessionLocal() as db:
+            if self.watermark is None:
+                self.watermark = (await db.execute(select(func.now()))).scalar_one()
+                return
+
+            # Transactions commit out of timestamp order, so read back a little
+            # further than the watermark; already applied rows are skipped
+            since = self.watermark - timedelta(seconds=settings.FAQ_REFRESH_LAG)
+            changed = (
+                await db.execute(
+                    select(
+                        FAQ.id,
+                        FAQ.question,
+                        FAQ.answer,
+                        FAQ.embedding,
+                        FAQ.embedding_model,
+                        FAQ.embedding_hash,
+                        FAQ.question_hash,
+                        FAQ.updated_at,
+                    )
+                    .where(FAQ.updated_at > since)
+                    .order_by(FAQ.updated_at)
+                )
+            ).all()
+            deleted = (
+                await db.execute(
+                    select(FAQDeletion.id, FAQDeletion.deleted_at).where(
+                        FAQDeletion.deleted_at > since
+                    )
+                )
+            ).all()
+
+            changed = [row for row in changed if self._applied.get(row.id) != row.updated_at]
+            deleted = [row for row in deleted if self._applied.get(-row.id) != row.deleted_at]
+            if changed or deleted:
+                self.apply(changed, [row.id for row in deleted])
+
+            for row in changed:
+                self._applied[row.id] = row.updated_at
+            for row in deleted:
+                self._applied[-row.id] = row.deleted_at
+            stamps = [row.updated_at for row in changed] + [row.deleted_at for row in deleted]
+            if stamps:
+                self.watermark = max(self.watermark, *stamps)
+            self._applied = {
+                key: stamp for key, stamp in self._applied.items() if stamp > since
+            }
+
+            if self.is_embedder:
+                stale = [row for row in changed if not self._is_fresh(row)]
+                if stale:
+                    # Only the changed rows: a backlog is left to
+                    # initialize_embeddings.py. Writing the embeddings
+                    # triggers another round of refreshes
+                    await embedding_service.compute_embeddings(
+                        db, faq_ids=[row.id for row in stale]
+                    )
+                await db.execute(
+                    delete(FAQDeletion).where(
+                        FAQDeletion.deleted_at < func.now() - DELETIONS_RETENTION
+                    )
+                )
+                await db.commit()
+
+    @staticmethod
+    def _is_fresh(row) -> bool:
+        return (
+            row.embedding is not None
+            and row.embedding_model == settings.EMBEDDING_SPACE
+            and row.embedding_hash == row.question_hash
+        )
+
+    def apply(self, changed: List, deleted_ids: List[int]):
+        """
+        Update the in-process indexes and caches for changed and deleted FAQs.
+        FAQs waiting for a new embedding are taken out of the vector index
+        until it arrives.
+        """
+        fresh = [row for row in changed if self._is_fresh(row)]
+        unsearchable = [row.id for row in changed if not self._is_fresh(row)] + deleted_ids
+
+        # Answers cached near the old or new version of a FAQ may contradict it
+        vectors = [row.embedding for row in fresh]
+        if settings.VECTOR_BACKEND.lower() == "memory" and vector_index.loaded:
+            old = (vector_index.vector(row.id) for row in changed)
+            vectors += [vector for vector in old if vector is not None]
+            vectors += [
+                vector
+                for vector in (vector_index.vector(faq_id) for faq_id in deleted_ids)
+                if vector is not None
+            ]
+            vector_index.remove(unsearchable)
+            vector_index.upsert(
+                [row.id for row in fresh],
+                [row.question for row in fresh],
+                [row.answer for row in fresh],
+                [row.embedding for row in fresh],
+            )
+
+        if lexical_index.loaded:
+            lexical_index.remove(deleted_ids)
+            lexical_index.upsert((row.id, row.question) for row in changed)
+
+        faq_responses.invalidate([row.id for row in changed] + deleted_ids)
+        dropped = answer_cache.invalidate_similar(
+            vectors, float(settings.SIMILARITY_THRESHOLD)
+        )
+        logger.info(
+            f"Applied FAQ changes: {len(fresh)} updated, {len(unsearchable)} "
+            f"removed or awaiting embedding, {dropped} cached answers dropped."
+        )
+
+
+# Instantiate the FAQ change feed
+faq_change_feed = FAQChangeFeed()
@@ -0,0 +1,41 @@
+import httpx
+
+from app.services.config import settings
+
+
+# Shared HTTP connection pool used by the async OpenAI clients, so the
+# embedding and chat calls reuse keep-alive connections instead of each
+# client opening its own pool
+http_async_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
+    ),
+    timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=5.0),
+)
+
+
+async def close_http_client():
+    """
+    Close the shared HTTP connection pool on application shutdown.
+    """
+    await http_async_client.aclose()
+
+
+# AsyncOpenAI client shared by the embeddings and chat models, created on first use
+_openai_api = None
+
+
+def openai_api():
+    """
+    Return the shared AsyncOpenAI client. The openai package is imported here
+    rather than at module import, keeping it off the import path of the app.
+    """
+    global _openai_api
+    if _openai_api is None:
+        from openai import AsyncOpenAI
+
+        _openai_api = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY, http_client=http_async_client
+        )
+    return _openai_api
@@ -0,0 +1,142 @@
+import asyncio
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import FAQ
+from app.utils.logger import logger
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+# An in-memory BM25 index over the FAQ questions, used to rerank vector candidates
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs: Dict[int, Counter] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.doc_freqs: Counter = Counter()
+        self.total_length = 0
+        self.avg_doc_length = 0.0
+        self.loaded = False
+        self._lock = asyncio.Lock()
+
+    def build(self, docs: Iterable[Tuple[int, str]]):
+        """
+        Build the index from (FAQ id, question) pairs.
+        """
+        self.term_freqs = {}
+        self.doc_lengths = {}
+        self.doc_freqs = Counter()
+        self.total_length = 0
+
+        for faq_id, question in docs:
+            self._add(faq_id, question)
+
+        self._update_average()
+        self.loaded = True
+
+    def upsert(self, docs: Iterable[Tuple[int, str]]):
+        """
+        Add or replace (FAQ id, question) pairs in place.
+        """
+        for faq_id, question in docs:
+            self._discard(faq_id)
+            self._add(faq_id, question)
+        self._update_average()
+
+    def remove(self, faq_ids: Iterable[int]):
+        """
+        Remove FAQs from the index in place.
+        """
+        for faq_id in faq_ids:
+            self._discard(faq_id)
+        self._update_average()
+
+    def _add(self, faq_id: int, question: str):
+        tokens = tokenize(question)
+        self.term_freqs[faq_id] = Counter(tokens)
+        self.doc_lengths[faq_id] = len(tokens)
+        self.doc_freqs.update(set(tokens))
+        self.total_length += len(tokens)
+
+    def _discard(self, faq_id: int):
+        freqs = self.term_freqs.pop(faq_id, None)
+        if freqs is None:
+            return
+        self.doc_freqs.subtract(set(freqs))
+        self.total_length -= self.doc_lengths.pop(faq_id)
+
+    def _update_average(self):
+        self.avg_doc_length = (
+            self.total_length / len(self.doc_lengths) if self.doc_lengths else 0.0
+        )
+
+    async def load(self, db: AsyncSession):
+        """
+        Build the index from every FAQ question in the database.
+        """
+        result = await db.execute(select(FAQ.id, FAQ.question))
+        rows = result.all()
+        self.build((row.id, row.question) for row in rows)
+        logger.info(f"Built the BM25 index over {len(rows)} FAQ questions.")
+
+    async def ensure_loaded(self, db: AsyncSession):
+        if self.loaded:
+            return
+        async with self._lock:
+            if not self.loaded:
+                await self.load(db)
+
+    def idf(self, term: str) -> float:
+        n = len(self.doc_lengths)
+        df = self.doc_freqs.get(term, 0)
+        return math.log((n - df + 0.5) / (df + 0.5) + 1)
+
+    def score(self, query: str, faq_ids: Sequence[int]) -> List[float]:
+        """
+        BM25 score of the query against each FAQ, scaled to [0, 1] by the score
+        of an average-length FAQ containing every query term once, i.e. roughly
+        the share of the query's IDF mass that matched. Query terms unknown to
+        the corpus count against the match at full IDF.
+        """
+        terms = set(tokenize(query))
+        if not terms or not self.doc_lengths:
+            return [0.0] * len(faq_ids)
+
+        idfs = {term: self.idf(term) for term in terms}
+        max_score = sum(idfs.values())
+        # FAQs made only of punctuation have no tokens: don't divide by zero
+        avg_doc_length = max(self.avg_doc_length, 1.0)
+
+        scores = []
+        for faq_id in faq_ids:
+            freqs = self.term_freqs.get(faq_id)
+            if not freqs:
+                scores.append(0.0)
+                continue
+
+            norm = self.k1 * (
+                1 - self.b + self.b * self.doc_lengths[faq_id] / avg_doc_length
+            )
+            total = 0.0
+            for term, idf in idfs.items():
+                tf = freqs.get(term, 0)
+                if tf:
+                    total += idf * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(min(1.0, total / max_score) if max_score else 0.0)
+
+        return scores
+
+
+# Instantiate the lexical index
+lexical_index = BM25Index()
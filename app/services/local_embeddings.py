@@ -0,0 +1,127 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from app.services.config import settings
+from app.utils.logger import logger
+
+
+def default_threads() -> int:
+    """
+    Torch threads per worker when LOCAL_EMBEDDING_THREADS is 0: the CPU cores
+    split between the gunicorn workers, so they don't oversubscribe the host.
+    """
+    cores = os.cpu_count() or 1
+    return max(1, cores // (settings.WEB_CONCURRENCY or cores))
+
+
+# Sentence-transformers model running on the CPU, with the interface of the OpenAI model
+class LocalEmbeddings:
+    """
+    Inference runs on one dedicated thread, keeping the event loop free; torch
+    spreads each batch over `threads` cores. Queries arriving while a batch is
+    being encoded are queued and encoded together in the next batch, so
+    concurrent requests share forward passes instead of waiting in line.
+    """
+
+    def __init__(self, model_name: str, dimensions: int, threads: int = 0, batch_size: int = 64):
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.threads = threads or default_threads()
+        self.batch_size = max(1, batch_size)
+        self._model = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embeddings")
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._drain_task: Optional[asyncio.Task] = None
+
+    def _load(self):
+        if self._model is not None:
+            return self._model
+
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_PROVIDER=local requires the sentence-transformers package "
+                "(pip install sentence-transformers)."
+            ) from e
+
+        torch.set_num_threads(self.threads)
+        model = SentenceTransformer(self.model_name, device="cpu")
+        native = model.get_sentence_embedding_dimension()
+        if self.dimensions > native:
+            raise ValueError(
+                f"{self.model_name} returns {native}-dimensional embeddings; "
+                f"set EMBEDDING_DIMENSIONS to {native} or less."
+            )
+        if self.dimensions < native:
+            # Keep the leading dimensions (meaningful for Matryoshka-trained models)
+            model.truncate_dim = self.dimensions
+        logger.info(
+            f"Loaded local embeddings model {self.model_name} "
+            f"({self.dimensions} dimensions, {self.threads} threads)."
+        )
+        self._model = model
+        return model
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._load().encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    async def aload(self):
+        """
+        Load the model on the inference thread ahead of the first request.
+        """
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._load)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._encode, list(texts)
+        )
+
+    async def aembed_query(self, text: str) -> List[float]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        if self._drain_task is None:
+            self._drain_task = asyncio.create_task(self._drain())
+        return await future
+
+    async def _drain(self):
+        """
+        Encode the queued queries, up to `batch_size` per forward pass, until
+        the queue is empty.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending:
+                batch = self._pending[: self.batch_size]
+                del self._pending[: self.batch_size]
+                try:
+                    vectors = await loop.run_in_executor(
+                        self._executor, self._encode, [text for text, _ in batch]
+                    )
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                # Callers that timed out have cancelled their future
+                for (_, future), vector in zip(batch, vectors):
+                    if not future.done():
+                        future.set_result(vector)
+        finally:
+            self._drain_task = None
@@ -1,37 +1,131 @@
-from langchain_openai.chat_models import ChatOpenAI
-from langchain.schema import HumanMessage
+import asyncio
+import time
+from typing import AsyncIterator, List, NamedTuple
 
+from app.services.admission import Overloaded, llm_limiter
 from app.services.config import settings
+from app.services.http_client import openai_api
 from app.utils.logger import logger
 
+# Answer returned to the user when the OpenAI API call fails
+OPENAI_ERROR_ANSWER = "An error occurred while fetching the answer from OpenAI API."
+
+
+# A chat message, as sent to and returned by the chat model
+class ChatMessage(NamedTuple):
+    role: str
+    content: str
+
+
+# Chat completions straight on the OpenAI SDK
+class OpenAIChatModel:
+    """
+    Exposes `ainvoke` and `astream` over a list of messages (the interface the
+    benchmark fakes implement as well), without the LangChain import tree.
+    """
+
+    def __init__(self, model: str = "gpt-4o", temperature: float = 0.7):
+        self.model = model
+        self.temperature = temperature
+
+    def _request(self, messages: List[ChatMessage]) -> dict:
+        return {
+            "model": self.model,
+            "temperature": self.temperature,
+            "messages": [
+                {"role": message.role, "content": message.content} for message in messages
+            ],
+        }
+
+    async def ainvoke(self, messages: List[ChatMessage]) -> ChatMessage:
+        response = await openai_api().chat.completions.create(**self._request(messages))
+        return ChatMessage("assistant", response.choices[0].message.content or "")
+
+    async def astream(self, messages: List[ChatMessage]) -> AsyncIterator[ChatMessage]:
+        stream = await openai_api().chat.completions.create(
+            **self._request(messages), stream=True
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield ChatMessage("assistant", chunk.choices[0].delta.content)
+        finally:
+            # Release the connection when the caller stops early
+            await stream.close()
+
 
 # A client to interact with OpenAI's ChatGPT model
 class OpenAIClient:
-    def __init__(self):
-        # Initialize the OpenAI chat model with API key and model name
-        self.chat_model = ChatOpenAI(
-            openai_api_key=settings.OPENAI_API_KEY,
-            model_name="gpt-4o",
-            temperature=0.7,
-        )
+    def __init__(self, chat_model=None):
+        # The OpenAI chat model is created on first use, unless another model
+        # exposing the same chat interface is given
+        self._chat_model = chat_model
+
+    @property
+    def chat_model(self):
+        if self._chat_model is None:
+            self._chat_model = OpenAIChatModel()
+        return self._chat_model
+
+    @chat_model.setter
+    def chat_model(self, chat_model):
+        self._chat_model = chat_model
+
+    def warm_up(self):
+        """
+        Create the chat model and the OpenAI client ahead of the first request.
+        """
+        if isinstance(self.chat_model, OpenAIChatModel):
+            openai_api()
 
-    def get_answer(self, user_question: str) -> str:
+    async def get_answer(self, user_question: str) -> str:
         """
         Send a user question to OpenAI's chat model and return the response.
         """
         try:
-            logger.info(f"Sending question to OpenAI API: {user_question}")
+            logger.debug("Sending question to OpenAI API: {}", user_question)
             messages = [
-                HumanMessage(content=user_question)
+                ChatMessage("user", user_question)
             ]  # Wrap the question in a message
-            response = self.chat_model(messages)  # Get response from OpenAI chat model
+            async with llm_limiter.slot():
+                # Get response from OpenAI chat model without blocking the event loop
+                response = await asyncio.wait_for(
+                    self.chat_model.ainvoke(messages), timeout=settings.OPENAI_TIMEOUT
+                )
             answer = response.content.strip()  # Extract and clean the response content
-            logger.info("Received answer from OpenAI API.")
+            logger.debug("Received answer from OpenAI API.")
             return answer
+        except Overloaded:
+            raise
         except Exception as e:
             # Log and return an error message in case of failure
             logger.error(f"Error communicating with OpenAI API: {e}")
-            return "An error occurred while fetching the answer from OpenAI API."
+            return OPENAI_ERROR_ANSWER
+
+    async def stream_answer(self, user_question: str) -> AsyncIterator[str]:
+        """
+        Send a user question to OpenAI's chat model and yield the answer tokens
+        as they arrive. Errors are raised to the caller, which may already have
+        sent part of the answer.
+        """
+        logger.debug("Streaming question to OpenAI API: {}", user_question)
+        messages = [ChatMessage("user", user_question)]
+
+        async with llm_limiter.slot():
+            deadline = time.monotonic() + settings.OPENAI_TIMEOUT
+            chunks = self.chat_model.astream(messages).__aiter__()
+            while True:
+                try:
+                    # Apply the timeout to the whole completion, not each chunk
+                    chunk = await asyncio.wait_for(
+                        chunks.__anext__(), timeout=deadline - time.monotonic()
+                    )
+                except StopAsyncIteration:
+                    break
+                if chunk.content:
+                    yield chunk.content
+
+        logger.debug("Streamed answer from OpenAI API.")
 
 
 # Instantiate the OpenAI client for use in other modules
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import insert
+
+from app.db import AsyncSessionLocal
+from app.models import QueryLogEntry
+from app.services.config import settings
+from app.utils.logger import logger
+from app.utils.metrics import QUERY_LOG_DROPPED, current_timings
+
+
+def parquet_schema():
+    """
+    Schema of the Parquet query log files, matching the query_log table.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError(
+            "QUERY_LOG=parquet requires the pyarrow package (pip install pyarrow)."
+        ) from e
+
+    return pa.schema(
+        [
+            ("created_at", pa.timestamp("us", tz="UTC")),
+            ("question", pa.string()),
+            ("faq_id", pa.int32()),
+            ("candidate_ids", pa.list_(pa.int32())),
+            ("scores", pa.list_(pa.float32())),
+            ("vector_scores", pa.list_(pa.float32())),
+            ("source", pa.string()),
+            # JSON object of the stage timings in seconds
+            ("timings", pa.string()),
+            ("embedding_model", pa.string()),
+            ("embedding", pa.list_(pa.float32())),
+        ]
+    )
+
+
+# Records every answered question off the request path
+class QueryLog:
+    """
+    Requests only append an entry to a bounded in-memory queue; a background
+    task writes the queue in batches, every `flush_interval` seconds or as
+    soon as `batch_size` entries are waiting. When the writer falls behind,
+    new entries are dropped (and counted) instead of slowing down requests.
+    """
+
+    def __init__(
+        self,
+        target: str,
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 5,
+        path: str = "query_log",
+        embeddings: bool = False,
+    ):
+        self.target = target
+        self.queue_size = max(1, queue_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.path = Path(path)
+        self.embeddings = embeddings
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Entries the writer took off the queue and has not written yet
+        self._batch: List[dict] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.target in ("postgres", "parquet")
+
+    def start(self):
+        if not self.enabled:
+            return
+        if self.target == "parquet":
+            # Fail on startup rather than on the first flush
+            parquet_schema()
+            self.path.mkdir(parents=True, exist_ok=True)
+        self._queue = asyncio.Queue(self.queue_size)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Query log enabled ({self.target}).")
+
+    async def stop(self):
+        """
+        Stop the writer, then write its unfinished batch and the entries
+        still queued.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        entries, self._batch = self._batch, []
+        await self._flush(entries)
+        while not self._queue.empty():
+            await self._flush(self._take(self.batch_size))
+        self._queue = None
+
+    def record(
+        self,
+        question: str,
+        candidates: List[dict],
+        source: Optional[str],
+        embedding=None,
+    ):
+        """
+        Queue an entry for a question, its candidates (best first) and the
+        source of its answer, with the stage timings of the current request.
+        """
+        if self._queue is None:
+            return
+
+        store_embedding = self.embeddings and embedding is not None and len(embedding)
+        entry = {
+            "created_at": datetime.now(timezone.utc),
+            "question": question,
+            "faq_id": candidates[0]["id"] if candidates else None,
+            "candidate_ids": [candidate["id"] for candidate in candidates],
+            "scores": [float(candidate["similarity_score"]) for candidate in candidates],
+            "vector_scores": [
+                float(candidate.get("vector_score", candidate["similarity_score"]))
+                for candidate in candidates
+            ],
+            "source": source,
+            "timings": current_timings(),
+            "embedding_model": settings.EMBEDDING_SPACE if store_embedding else None,
+            "embedding": embedding if store_embedding else None,
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            QUERY_LOG_DROPPED.inc()
+
+    def _take(self, limit: int) -> List[dict]:
+        entries = []
+        while len(entries) < limit and not self._queue.empty():
+            entries.append(self._queue.get_nowait())
+        return entries
+
+    async def _run(self):
+        while True:
+            self._batch = [await self._queue.get()]
+            # Let a batch build up, unless one is already waiting
+            if self._queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.flush_interval)
+            self._batch += self._take(self.batch_size - 1)
+            await self._flush(self._batch)
+            self._batch = []
+
+    async def _flush(self, entries: List[dict]):
+        if not entries:
+            return
+        try:
+            if self.target == "postgres":
+                await self._write_postgres(entries)
+            else:
+                await asyncio.to_thread(self._write_parquet, entries)
+        except Exception as e:
+            QUERY_LOG_DROPPED.inc(len(entries))
+            logger.error(f"Error writing {len(entries)} query log entries: {e}")
+
+    async def _write_postgres(self, entries: List[dict]):
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(QueryLogEntry), entries)
+            await db.commit()
+
+    def _write_parquet(self, entries: List[dict]):
+        """
+        Write a batch as a new Parquet file; it is renamed into place once
+        complete, so readers never see a partial file.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        rows = [
+            {
+                **entry,
+                "timings": json.dumps(entry["timings"]),
+                "embedding": None
+                if entry["embedding"] is None
+                else [float(value) for value in entry["embedding"]],
+            }
+            for entry in entries
+        ]
+        table = pa.Table.from_pylist(rows, schema=parquet_schema())
+        name = f"{entries[0]['created_at']:%Y%m%dT%H%M%S%f}-{os.getpid()}.parquet"
+        temporary = self.path / f".{name}.tmp"
+        pq.write_table(table, temporary)
+        os.replace(temporary, self.path / name)
+
+
+# Instantiate the query log
+query_log = QueryLog(
+    settings.QUERY_LOG,
+    queue_size=settings.QUERY_LOG_QUEUE_SIZE,
+    batch_size=settings.QUERY_LOG_BATCH_SIZE,
+    flush_interval=settings.QUERY_LOG_FLUSH_INTERVAL,
+    path=settings.QUERY_LOG_PATH,
+    embeddings=settings.QUERY_LOG_EMBEDDINGS,
+)
@@ -1,59 +1,262 @@
+from typing import List, Optional
+import numpy as np
+from pgvector import Vector
 from app.utils.logger import logger
+from app.services.ann_index import distance_sql
 from app.services.config import settings
 from app.models import FAQ
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from app.services.embeddings import embedding_service
+from app.services.lexical import lexical_index
+from app.services.vector_index import vector_index
+
+# Similarity queries, built once so every call sends identical SQL text and
+# reuses the statement asyncpg prepared on the connection.
+# The <=> operator is the cosine distance. The shortlist is ordered on the
+# indexed expression so the HNSW/IVFFlat index serves it; with float16 or
+# binary precision it holds more candidates than needed, which are then
+# rescored against the full-precision embeddings. FAQs waiting for an
+# embedding would sort last with a NULL distance, so they are left out.
+SIMILARITY_QUERY = text(
+    f"""
+    SELECT id, question, answer, embedding <=> CAST(:embedding AS vector) AS distance
+    FROM (
+        SELECT id, question, answer, embedding
+        FROM faqs
+        WHERE embedding IS NOT NULL
+        ORDER BY {distance_sql("CAST(:embedding AS vector)")}
+        LIMIT :candidates
+    ) shortlist
+    ORDER BY distance
+    LIMIT :k;
+"""
+)
+BATCH_SIMILARITY_QUERY = text(
+    f"""
+    SELECT q.idx, f.id, f.question, f.answer, f.distance
+    FROM unnest(CAST(:embeddings AS vector[])) WITH ORDINALITY AS q(query_embedding, idx)
+    CROSS JOIN LATERAL (
+        SELECT id, question, answer, embedding <=> q.query_embedding AS distance
+        FROM (
+            SELECT id, question, answer, embedding
+            FROM faqs
+            WHERE embedding IS NOT NULL
+            ORDER BY {distance_sql("q.query_embedding")}
+            LIMIT :candidates
+        ) shortlist
+        ORDER BY distance
+        LIMIT :k
+    ) f
+    ORDER BY q.idx, f.distance;
+"""
+)
+
+
+def candidates_for(k: int) -> int:
+    """
+    Number of index candidates fetched for the top-k: k itself for exact
+    float32 search, k * VECTOR_RESCORE_FACTOR when they are rescored.
+    """
+    if settings.VECTOR_PRECISION == "float32":
+        return k
+    return k * max(1, settings.VECTOR_RESCORE_FACTOR)
+
+
+def to_vector(embedding) -> Vector:
+    """
+    Wrap an embedding for the binary pgvector codec.
+    """
+    return Vector(np.asarray(embedding, dtype=np.float32))
 
 
 class SimilarityService:
     def __init__(self):
-        pass
+        self.backend = settings.VECTOR_BACKEND.lower()
+        if self.backend not in ("pgvector", "memory"):
+            raise ValueError(f"Unknown vector backend: {settings.VECTOR_BACKEND}")
+
+    async def load_index(self, db: AsyncSession):
+        """
+        Load the in-memory indexes ahead of the first request when they are in use.
+        """
+        if self.backend == "memory":
+            await vector_index.ensure_loaded(db)
+        if settings.LEXICAL_RERANK:
+            await lexical_index.ensure_loaded(db)
 
     async def find_most_similar(self, user_question: str, db: AsyncSession):
         """
-        Find the most similar question from the FAQ database using pgVector.
+        Find the most similar question from the FAQ database using the configured backend.
         """
-        logger.info(f"Finding most similar question for: {user_question}")
+        logger.debug("Finding most similar question for: {}", user_question)
 
         # Generate the embedding for the user question using OpenAI
         embedding = await embedding_service.compute_single_embedding(user_question)
 
-        # SQL query to find the most similar FAQ based on embeddings
-        # (using the <=> operator for cosine similarity)
-        query = text(
-            """
-            SELECT id, question, answer, embedding <=> :embedding AS similarity_score
-            FROM faqs
-            ORDER BY similarity_score
-            LIMIT 1;
+        return await self.find_most_similar_by_embedding(embedding, db, user_question)
+
+    async def find_most_similar_by_embedding(
+        self, embedding, db: AsyncSession, user_question: Optional[str] = None
+    ):
         """
-        )
+        Find the most similar question for an already computed question embedding.
+        When the question text is given, the top-k candidates are reranked lexically.
+        """
+        candidates = await self.find_candidates(embedding, db, user_question)
+        if not candidates:
+            return None, 0.0
 
-        try:
-            logger.info("Executing similarity search query...")
-            result = await db.execute(query, {"embedding": str(embedding)})
-            logger.info("Query executed successfully.")
-            row = result.fetchone()
-            logger.info(f"Row: {row}")
+        best = candidates[0]
+        logger.debug("Found similar question: {}", best["question"])
 
-            if row is None:
-                return None, 0.0
+        faq_entry = {"id": best["id"], "question": best["question"], "answer": best["answer"]}
+        return faq_entry, best["similarity_score"]
+
+    async def find_candidates(
+        self, embedding, db: AsyncSession, user_question: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Return the top-k FAQ candidates, reranked lexically when the question
+        text is given, best first.
+        """
+        candidates = await self.find_top_k(embedding, db)
+        if user_question is not None:
+            candidates = await self.rerank(user_question, candidates, db)
+        return candidates
 
-            id, question, answer, similarity_score = row
+    async def find_top_k(
+        self, embedding, db: AsyncSession, k: Optional[int] = None
+    ) -> List[dict]:
+        """
+        Return the top-k FAQ candidates with their cosine similarity, best first.
+        """
+        k = k or settings.SIMILARITY_TOP_K
 
-            logger.info(f"Found similar question: {question}")
+        if self.backend == "memory":
+            await vector_index.ensure_loaded(db)
+            return vector_index.search(embedding, k=k)
 
-            faq_entry = {"question": question, "answer": answer}
+        return await self._find_in_pgvector(embedding, db, k)
 
-            # Calculate the cosine similarity score from the distance (1 - distance)
-            similarity_score = 1 - similarity_score
+    async def find_top_k_batch(
+        self, embeddings: List[List[float]], db: AsyncSession, k: Optional[int] = None
+    ) -> List[List[dict]]:
+        """
+        Return the top-k FAQ candidates for each embedding, resolved with one
+        matrix product or one database round trip for the whole batch.
+        Empty embeddings (failed embedding calls) get no candidates.
+        """
+        k = k or settings.SIMILARITY_TOP_K
+        positions = [i for i, embedding in enumerate(embeddings) if len(embedding)]
+        results: List[List[dict]] = [[] for _ in embeddings]
+        if not positions:
+            return results
+
+        valid = [embeddings[i] for i in positions]
+        if self.backend == "memory":
+            await vector_index.ensure_loaded(db)
+            matches = vector_index.search_batch(valid, k=k)
+        else:
+            matches = await self._find_batch_in_pgvector(valid, db, k)
+
+        for position, candidates in zip(positions, matches):
+            results[position] = candidates
+        return results
+
+    async def rerank(
+        self, user_question: str, candidates: List[dict], db: AsyncSession
+    ) -> List[dict]:
+        """
+        Combine each candidate's vector score with its BM25 score over the FAQ
+        question. The lexical score can only raise a candidate's score, so strong
+        keyword matches clear the threshold while vector matches are never demoted.
+        """
+        if not settings.LEXICAL_RERANK or not candidates:
+            return candidates
 
-            return faq_entry, similarity_score
+        await lexical_index.ensure_loaded(db)
+        lexical_scores = lexical_index.score(
+            user_question, [candidate["id"] for candidate in candidates]
+        )
+
+        weight = settings.LEXICAL_WEIGHT
+        for candidate, lexical_score in zip(candidates, lexical_scores):
+            vector_score = candidate["similarity_score"]
+            candidate["vector_score"] = vector_score
+            candidate["lexical_score"] = lexical_score
+            candidate["similarity_score"] = max(
+                vector_score, (1 - weight) * vector_score + weight * lexical_score
+            )
+
+        return sorted(candidates, key=lambda c: c["similarity_score"], reverse=True)
+
+    async def _find_in_pgvector(self, embedding, db: AsyncSession, k: int) -> List[dict]:
+        """
+        Find the top-k most similar questions from the FAQ database using pgVector.
+        """
+        try:
+            logger.debug("Executing similarity search query...")
+            result = await db.execute(
+                SIMILARITY_QUERY,
+                {
+                    "embedding": to_vector(embedding),
+                    "k": k,
+                    "candidates": candidates_for(k),
+                },
+            )
+            logger.debug("Query executed successfully.")
+            rows = result.fetchall()
+            logger.debug("Rows: {}", rows)
+
+            # Calculate the cosine similarity score from the distance (1 - distance)
+            return [
+                {
+                    "id": id,
+                    "question": question,
+                    "answer": answer,
+                    "similarity_score": 1 - distance,
+                }
+                for id, question, answer, distance in rows
+            ]
         except Exception as e:
             logger.error(f"Error during similarity search: {e}")
             raise
 
+    async def _find_batch_in_pgvector(
+        self, embeddings: List[List[float]], db: AsyncSession, k: int
+    ) -> List[List[dict]]:
+        """
+        Find the top-k most similar questions for several embeddings in one query,
+        running an index-backed nearest neighbour search per embedding laterally.
+        """
+        try:
+            logger.debug(
+                "Executing batch similarity search for {} questions...", len(embeddings)
+            )
+            result = await db.execute(
+                BATCH_SIMILARITY_QUERY,
+                {
+                    "embeddings": [to_vector(embedding) for embedding in embeddings],
+                    "k": k,
+                    "candidates": candidates_for(k),
+                },
+            )
+            results: List[List[dict]] = [[] for _ in embeddings]
+            for idx, id, question, answer, distance in result.fetchall():
+                results[idx - 1].append(
+                    {
+                        "id": id,
+                        "question": question,
+                        "answer": answer,
+                        "similarity_score": 1 - distance,
+                    }
+                )
+            return results
+        except Exception as e:
+            logger.error(f"Error during batch similarity search: {e}")
+            raise
+
 
 # Instantiate the similarity service
 similarity_service = SimilarityService()
@@ -0,0 +1,255 @@
+import mmap
+import os
+import struct
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# File layout (little endian, every section aligned to 64 bytes):
+#   header   magic, format version, matrix dtype, rows, dim, section offsets,
+#            change feed watermark (epoch seconds), embeddings model length
+#   matrix   rows x dim L2-normalized embeddings (float32 or float16)
+#   ids      rows x int64 FAQ ids
+#   offsets  (2 * rows + 1) x int64 offsets into the text blob; question i
+#            spans [2i, 2i + 1] and answer i spans [2i + 1, 2i + 2]
+#   texts    UTF-8 question and answer text, back to back, then the UTF-8
+#            embeddings model name
+MAGIC = b"ASKMEVEC"
+FORMAT_VERSION = 3
+HEADER = struct.Struct("<8sIIQIQQQQdI")
+ALIGNMENT = 64
+DTYPES = {"float32": 1, "float16": 2}
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class SnapshotError(Exception):
+    """
+    Raised when a snapshot file is missing, corrupt or from another format version.
+    """
+
+
+class SnapshotTexts(Sequence[str]):
+    """
+    Read-only sequence over the questions or answers of a snapshot, decoded
+    from the mapped text blob on access.
+    """
+
+    def __init__(self, blob: memoryview, offsets: np.ndarray, field: int):
+        self.blob = blob
+        self.offsets = offsets
+        self.field = field
+
+    def __len__(self) -> int:
+        return (len(self.offsets) - 1) // 2
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        start = int(self.offsets[2 * i + self.field])
+        end = int(self.offsets[2 * i + self.field + 1])
+        return str(self.blob[start:end], "utf-8")
+
+
+class Snapshot:
+    """
+    A snapshot file mapped into memory. `ids` and `matrix` are read-only NumPy
+    views of the mapping, so opening a snapshot copies nothing and processes
+    mapping the same file share its pages.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            with open(self.path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Cannot map {self.path}: {e}") from e
+
+        if len(self._mmap) < HEADER.size:
+            raise SnapshotError(f"{self.path} is too short to be a snapshot.")
+        (
+            magic,
+            version,
+            dtype_code,
+            rows,
+            dim,
+            ids_offset,
+            offsets_offset,
+            texts_offset,
+            texts_length,
+            watermark,
+            model_length,
+        ) = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{self.path} is not an embedding snapshot.")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(
+                f"{self.path} has format version {version}, expected {FORMAT_VERSION}."
+            )
+        dtypes = {code: name for name, code in DTYPES.items()}
+        if dtype_code not in dtypes:
+            raise SnapshotError(f"{self.path} has an unknown matrix dtype.")
+
+        # A file cut short (e.g. by a crash while copying it) must not be mapped
+        itemsize = np.dtype(dtypes[dtype_code]).itemsize
+        sections = [
+            (_aligned(HEADER.size), rows * dim * itemsize),
+            (ids_offset, rows * 8),
+            (offsets_offset, (2 * rows + 1) * 8),
+            (texts_offset, texts_length),
+            (texts_offset + texts_length, model_length),
+        ]
+        end = 0
+        for offset, length in sections:
+            if offset < end:
+                raise SnapshotError(f"{self.path} has overlapping sections.")
+            end = offset + length
+        if end > len(self._mmap):
+            raise SnapshotError(
+                f"{self.path} is truncated: {len(self._mmap)} bytes, expected {end}."
+            )
+
+        model_offset = texts_offset + texts_length
+        try:
+            self.embeddings_model = str(
+                self._mmap[model_offset : model_offset + model_length], "utf-8"
+            )
+        except UnicodeDecodeError as e:
+            raise SnapshotError(f"{self.path} has a corrupt embeddings model name.") from e
+        # FAQ changes from this time on are not in the snapshot
+        self.watermark = datetime.fromtimestamp(watermark, timezone.utc) if watermark else None
+        self.matrix = np.frombuffer(
+            self._mmap, dtype=dtypes[dtype_code], count=rows * dim, offset=_aligned(HEADER.size)
+        ).reshape(rows, dim)
+        self.ids = np.frombuffer(self._mmap, dtype=np.int64, count=rows, offset=ids_offset)
+        offsets = np.frombuffer(
+            self._mmap, dtype=np.int64, count=2 * rows + 1, offset=offsets_offset
+        )
+        blob = memoryview(self._mmap)[texts_offset : texts_offset + texts_length]
+        self.questions = SnapshotTexts(blob, offsets, 0)
+        self.answers = SnapshotTexts(blob, offsets, 1)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class SnapshotWriter:
+    """
+    Write a snapshot incrementally, one page of rows at a time. Embeddings are
+    written out as they are appended, so at most a page of them is held in
+    memory; the ids and texts of every row are kept until `close`, which
+    writes them after the matrix. The file is written under a temporary name
+    and renamed into place on `close`, so readers only ever see complete
+    snapshots.
+
+        with SnapshotWriter(path, "float16", "text-embedding-3-small") as writer:
+            writer.append(ids, questions, answers, embeddings)
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        dtype: str = "float32",
+        embeddings_model: str = "",
+        watermark: Optional[datetime] = None,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported snapshot dtype: {dtype}")
+        self.path = Path(path)
+        self.dtype = dtype
+        self.embeddings_model = embeddings_model
+        self.watermark = watermark
+        self.rows = 0
+        self.dim: Optional[int] = None
+        self._ids = array("q")
+        self._texts: List[bytes] = []
+        self._offsets = array("q", [0])
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        self._file = open(self._tmp_path, "wb")
+        self._file.seek(_aligned(HEADER.size))
+
+    def append(
+        self,
+        ids: Sequence[int],
+        questions: Sequence[str],
+        answers: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+    ):
+        if len(ids) == 0:
+            return
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {matrix.shape[1]}")
+
+        # Normalize once here so a query only needs a dot product
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._file.write((matrix / norms).astype(self.dtype).tobytes())
+
+        self._ids.extend(int(i) for i in ids)
+        for question, answer in zip(questions, answers):
+            for text in (question, answer):
+                encoded = text.encode("utf-8")
+                self._texts.append(encoded)
+                self._offsets.append(self._offsets[-1] + len(encoded))
+        self.rows += len(ids)
+
+    def close(self):
+        f = self._file
+        ids_offset = _aligned(f.tell())
+        f.seek(ids_offset)
+        f.write(self._ids.tobytes())
+        offsets_offset = _aligned(f.tell())
+        f.seek(offsets_offset)
+        f.write(self._offsets.tobytes())
+        texts_offset = f.tell()
+        for encoded in self._texts:
+            f.write(encoded)
+        model = self.embeddings_model.encode("utf-8")
+        f.write(model)
+
+        f.seek(0)
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                DTYPES[self.dtype],
+                self.rows,
+                self.dim or 0,
+                ids_offset,
+                offsets_offset,
+                texts_offset,
+                self._offsets[-1],
+                self.watermark.timestamp() if self.watermark else 0.0,
+                len(model),
+            )
+        )
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
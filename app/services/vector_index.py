@@ -0,0 +1,467 @@
+import asyncio
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import FAQ
+from app.services.config import settings
+from app.services.snapshot import Snapshot, SnapshotError, SnapshotWriter
+from app.utils.logger import logger
+
+# Rows fetched per query when exporting a snapshot from the database
+SNAPSHOT_PAGE_SIZE = 10000
+# Rows scored per block when the matrix is stored as float16
+SCORE_BLOCK_ROWS = 4096
+# Search precisions: exact float32, float16 matrix, or binary codes with rescoring
+PRECISIONS = ("float32", "float16", "binary")
+# Changed rows are kept in a small overlay index until they exceed this many
+# rows (or 5% of the index), when they are merged into the main matrix
+DELTA_MAX_ROWS = 10000
+
+
+def _popcount(codes: np.ndarray) -> np.ndarray:
+    """
+    Number of set bits in each byte of a uint8 array.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(codes)
+    return np.unpackbits(codes[..., None], axis=-1).sum(axis=-1, dtype=np.uint8)
+
+
+# An exact cosine-similarity index over the FAQ embeddings kept in process memory
+class InMemoryVectorIndex:
+    def __init__(
+        self, path: Optional[str] = None, precision: str = "float32", rescore_factor: int = 10
+    ):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown vector precision: {precision}")
+        # Optional snapshot file shared by all workers on the host
+        self.path = Path(path) if path else None
+        self.precision = precision
+        # With binary codes, k * rescore_factor candidates are rescored exactly
+        self.rescore_factor = max(1, rescore_factor)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.questions: Sequence[str] = []
+        self.answers: Sequence[str] = []
+        # Matrix with one L2-normalized embedding per row: contiguous float32
+        # when built in process, float32 or float16 when mapped from a snapshot
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        # Sign bits of each row packed into bytes, when searching with binary codes
+        self.codes: Optional[np.ndarray] = None
+        # FAQ changes made from this time on are not reflected in the index yet
+        self.watermark: Optional[datetime] = None
+        # Rows changed since the index was built or mapped: main matrix rows
+        # masked out, and the current version of changed FAQs in an overlay
+        self.removed: Optional[np.ndarray] = None
+        self.changes: Dict[int, Tuple[str, str, np.ndarray]] = {}
+        self.delta: Optional["InMemoryVectorIndex"] = None
+        self._sorted_ids: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.loaded = False
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        removed = int(self.removed.sum()) if self.removed is not None else 0
+        return len(self.ids) - removed + len(self.changes)
+
+    def build(
+        self,
+        ids: Sequence[int],
+        questions: Sequence[str],
+        answers: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+    ):
+        """
+        Build the index from parallel sequences of FAQ ids, texts and embeddings.
+        Rows are normalized once here so a query only needs a dot product.
+        """
+        if len(ids) == 0:
+            # A fresh database, or FAQs not embedded yet
+            matrix = np.empty((0, settings.EMBEDDING_DIMENSIONS), dtype=np.float32)
+        else:
+            matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+            if matrix.ndim != 2:
+                matrix = matrix.reshape(len(ids), -1)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+
+        if self.precision == "float16":
+            matrix = matrix.astype(np.float16)
+
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.questions = list(questions)
+        self.answers = list(answers)
+        self.matrix = matrix
+        self._build_codes()
+        self._reset_changes()
+        self.loaded = True
+
+    def _build_codes(self):
+        """
+        Quantize every row to one bit per dimension (its sign) for the binary
+        precision: 32x smaller than float32 and compared by Hamming distance.
+        """
+        if self.precision != "binary":
+            self.codes = None
+            return
+        self.codes = np.concatenate(
+            [
+                np.packbits(self.matrix[i : i + SCORE_BLOCK_ROWS] > 0, axis=1)
+                for i in range(0, len(self.matrix), SCORE_BLOCK_ROWS)
+            ]
+            or [np.empty((0, 0), dtype=np.uint8)]
+        )
+
+    async def load(self, db: AsyncSession):
+        """
+        Load every embedded FAQ from the database into the index.
+        """
+        # The transaction start time: rows changed later may or may not be
+        # included, so the change feed picks them up again from here
+        watermark = (await db.execute(select(func.now()))).scalar_one()
+        result = await db.execute(
+            select(FAQ.id, FAQ.question, FAQ.answer, FAQ.embedding).where(
+                FAQ.embedding.isnot(None)
+            )
+        )
+        rows = result.all()
+
+        self.build(
+            [row.id for row in rows],
+            [row.question for row in rows],
+            [row.answer for row in rows],
+            [row.embedding for row in rows],
+        )
+        self.watermark = watermark
+        logger.info(f"Loaded {len(rows)} FAQ embeddings into the in-memory index.")
+
+    def save(self, path: Path, dtype: str = "float32"):
+        """
+        Write the index to a snapshot file (see app/services/snapshot.py).
+        """
+        self.compact()
+        with SnapshotWriter(
+            path, dtype, settings.EMBEDDING_SPACE, self.watermark
+        ) as writer:
+            writer.append(self.ids, self.questions, self.answers, self.matrix)
+
+    @staticmethod
+    async def export(db: AsyncSession, path: Path, dtype: str = "float32") -> int:
+        """
+        Stream every embedded FAQ from the database into a snapshot file, one
+        page at a time, without building the index in memory. Returns the
+        number of exported rows.
+        """
+        watermark = (await db.execute(select(func.now()))).scalar_one()
+        with SnapshotWriter(path, dtype, settings.EMBEDDING_SPACE, watermark) as writer:
+            last_id = 0
+            while True:
+                result = await db.execute(
+                    select(FAQ.id, FAQ.question, FAQ.answer, FAQ.embedding)
+                    .where(FAQ.embedding.isnot(None), FAQ.id > last_id)
+                    .order_by(FAQ.id)
+                    .limit(SNAPSHOT_PAGE_SIZE)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                writer.append(
+                    [row.id for row in rows],
+                    [row.question for row in rows],
+                    [row.answer for row in rows],
+                    [row.embedding for row in rows],
+                )
+            return writer.rows
+
+    def open(self, path: Path):
+        """
+        Map a snapshot file. Nothing is copied: the matrix and ids are views of
+        the mapping and texts are decoded on access, so every worker on the
+        host shares the same page cache copy.
+        """
+        snapshot = Snapshot(path)
+        if snapshot.embeddings_model != settings.EMBEDDING_SPACE:
+            raise SnapshotError(
+                f"{path} was exported for {snapshot.embeddings_model}, "
+                f"not {settings.EMBEDDING_SPACE}."
+            )
+
+        self.ids = snapshot.ids
+        self.questions = snapshot.questions
+        self.answers = snapshot.answers
+        self.matrix = snapshot.matrix
+        self._build_codes()
+        self._reset_changes()
+        self.watermark = snapshot.watermark
+        self.loaded = True
+        logger.info(f"Mapped {len(snapshot)} FAQ embeddings from {path}.")
+
+    async def ensure_loaded(self, db: AsyncSession):
+        """
+        Load the index on first use, from the snapshot file when there is a
+        usable one and from the database otherwise; concurrent callers wait for
+        a single load.
+        """
+        if self.loaded:
+            return
+        async with self._lock:
+            if self.loaded:
+                return
+            if self.path is not None and self.path.exists():
+                try:
+                    self.open(self.path)
+                    return
+                except SnapshotError as e:
+                    logger.warning(f"Ignoring the index snapshot: {e}")
+            await self.load(db)
+
+    def _reset_changes(self):
+        self.removed = None
+        self.changes = {}
+        self.delta = None
+        self._sorted_ids = None
+
+    def _row_of(self, faq_id: int) -> Optional[int]:
+        """
+        Position of a FAQ in the main matrix, via a lazily built sorted id array.
+        """
+        if self._sorted_ids is None:
+            order = np.argsort(self.ids, kind="stable")
+            self._sorted_ids = (self.ids[order], order)
+        sorted_ids, order = self._sorted_ids
+        position = int(np.searchsorted(sorted_ids, faq_id))
+        if position < len(sorted_ids) and sorted_ids[position] == faq_id:
+            return int(order[position])
+        return None
+
+    def vector(self, faq_id: int) -> Optional[np.ndarray]:
+        """
+        The current normalized embedding of a FAQ, or None if it isn't indexed.
+        """
+        if faq_id in self.changes:
+            return self.changes[faq_id][2]
+        row = self._row_of(faq_id)
+        if row is None or (self.removed is not None and self.removed[row]):
+            return None
+        return self.matrix[row].astype(np.float32)
+
+    def upsert(
+        self,
+        ids: Sequence[int],
+        questions: Sequence[str],
+        answers: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+    ):
+        """
+        Add or replace FAQs in place. The main matrix (possibly a read-only
+        mapping) is never written: replaced rows are masked out and the new
+        versions are searched in a small overlay index.
+        """
+        for faq_id, question, answer, embedding in zip(ids, questions, answers, embeddings):
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            self._mask(int(faq_id))
+            self.changes[int(faq_id)] = (question, answer, vector / norm if norm else vector)
+        self._rebuild_delta()
+
+    def remove(self, ids: Sequence[int]):
+        """
+        Remove FAQs from the index in place.
+        """
+        for faq_id in ids:
+            self._mask(int(faq_id))
+            self.changes.pop(int(faq_id), None)
+        self._rebuild_delta()
+
+    def _mask(self, faq_id: int):
+        row = self._row_of(faq_id)
+        if row is not None:
+            if self.removed is None:
+                self.removed = np.zeros(len(self.ids), dtype=bool)
+            self.removed[row] = True
+
+    def _rebuild_delta(self):
+        if len(self.changes) > max(DELTA_MAX_ROWS, len(self.ids) // 20):
+            self.compact()
+            return
+
+        self.delta = None
+        if self.changes:
+            delta = InMemoryVectorIndex(precision="float32")
+            delta.build(
+                list(self.changes),
+                [change[0] for change in self.changes.values()],
+                [change[1] for change in self.changes.values()],
+                [change[2] for change in self.changes.values()],
+            )
+            self.delta = delta
+
+    def compact(self):
+        """
+        Merge the overlay into a new main matrix, dropping removed rows.
+        """
+        if self.removed is None and not self.changes:
+            return
+
+        keep = (
+            np.flatnonzero(~self.removed)
+            if self.removed is not None
+            else np.arange(len(self.ids))
+        )
+        changes = self.changes
+        dims = self.matrix.shape[1] if len(self.ids) else None
+        matrix = [self.matrix[keep].astype(np.float32)] if dims else []
+        if changes:
+            matrix.append(np.asarray([change[2] for change in changes.values()]))
+        watermark = self.watermark
+
+        self.build(
+            np.concatenate([self.ids[keep], np.fromiter(changes, dtype=np.int64)]),
+            [self.questions[i] for i in keep] + [change[0] for change in changes.values()],
+            [self.answers[i] for i in keep] + [change[1] for change in changes.values()],
+            np.concatenate(matrix) if matrix else np.empty((0, 0), dtype=np.float32),
+        )
+        self.watermark = watermark
+        logger.info(f"Compacted the in-memory index to {len(self.ids)} FAQs.")
+
+    def search(self, embedding: Sequence[float], k: int = 1) -> List[dict]:
+        """
+        Return the top-k FAQ entries by cosine similarity, best match first.
+        """
+        if len(self) == 0 or len(embedding) == 0:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+
+        query = query / norm
+        if len(self.ids) == 0:
+            results = []
+        elif self.codes is not None:
+            results = self._rescored_top_k(query, k)
+        else:
+            results = self._top_k(self._masked(self._scores(query)), k)
+
+        if self.delta is not None:
+            results = self._merge(results, self.delta.search(query, k), k)
+        return results
+
+    def search_batch(
+        self, embeddings: Sequence[Sequence[float]], k: int = 1
+    ) -> List[List[dict]]:
+        """
+        Return the top-k FAQ entries for each query embedding, scoring every
+        query against the whole index with a single matrix product.
+        """
+        if len(self) == 0 or len(embeddings) == 0:
+            return [[] for _ in embeddings]
+
+        queries = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+        if len(self.ids) == 0:
+            results = [[] for _ in queries]
+        elif self.codes is not None:
+            results = [self._rescored_top_k(query, k) for query in queries]
+        else:
+            scores = self._masked(self._scores(queries.T)).T
+            results = [self._top_k(row, k) for row in scores]
+
+        if self.delta is not None:
+            results = [
+                self._merge(base, delta, k)
+                for base, delta in zip(results, self.delta.search_batch(queries, k))
+            ]
+        return results
+
+    def _masked(self, scores: np.ndarray) -> np.ndarray:
+        """
+        Exclude removed rows (the first axis of `scores`) from the results.
+        """
+        if self.removed is not None:
+            scores[self.removed] = -np.inf
+        return scores
+
+    @staticmethod
+    def _merge(first: List[dict], second: List[dict], k: int) -> List[dict]:
+        return sorted(first + second, key=lambda hit: hit["similarity_score"], reverse=True)[:k]
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Dot products of every row with the query vector(s) (dim or dim x n).
+        A float16 matrix is upcast block by block rather than all at once.
+        """
+        if self.matrix.dtype == np.float32:
+            return self.matrix @ queries
+        return np.concatenate(
+            [
+                self.matrix[i : i + SCORE_BLOCK_ROWS].astype(np.float32) @ queries
+                for i in range(0, len(self.matrix), SCORE_BLOCK_ROWS)
+            ]
+        )
+
+    def _rescored_top_k(self, query: np.ndarray, k: int) -> List[dict]:
+        """
+        Shortlist the rows whose binary codes are closest to the query's in
+        Hamming distance, then rank the shortlist by exact cosine similarity.
+        """
+        distances = _popcount(self.codes ^ np.packbits(query > 0)).sum(
+            axis=1, dtype=np.int32
+        )
+        if self.removed is not None:
+            distances[self.removed] = np.iinfo(np.int32).max
+        n = min(len(distances), k * self.rescore_factor)
+        if n < len(distances):
+            shortlist = np.sort(np.argpartition(distances, n - 1)[:n])
+        else:
+            shortlist = np.arange(len(distances))
+        scores = self.matrix[shortlist].astype(np.float32) @ query
+        if self.removed is not None:
+            scores[self.removed[shortlist]] = -np.inf
+        return self._top_k(scores, k, shortlist)
+
+    def _top_k(
+        self, scores: np.ndarray, k: int, rows: Optional[np.ndarray] = None
+    ) -> List[dict]:
+        """
+        The k best scores as result dicts; `rows` maps score positions to index
+        rows when only a subset of the rows was scored.
+        """
+        k = min(k, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+
+        results = []
+        for position in top:
+            if scores[position] == -np.inf:
+                # Removed rows sort last
+                break
+            i = position if rows is None else rows[position]
+            results.append(
+                {
+                    "id": int(self.ids[i]),
+                    "question": self.questions[i],
+                    "answer": self.answers[i],
+                    "similarity_score": float(scores[position]),
+                }
+            )
+        return results
+
+
+# Instantiate the in-memory vector index
+vector_index = InMemoryVectorIndex(
+    settings.VECTOR_INDEX_PATH, settings.VECTOR_PRECISION, settings.VECTOR_RESCORE_FACTOR
+)
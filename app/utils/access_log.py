@@ -0,0 +1,52 @@
+import random
+import time
+
+from app.services.config import settings
+from app.utils.logger import logger
+
+
+# ASGI middleware writing one consolidated, sampled access record per request
+class AccessLogMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            # Errors and slow requests are always kept; the rest are sampled
+            if (
+                status_code >= 500
+                or elapsed_ms >= settings.LOG_SLOW_REQUEST_MS
+                or random.random() < settings.LOG_SAMPLE_RATE
+            ):
+                # Endpoints record how they answered in the request state
+                source = scope.get("state", {}).get("answer_source")
+                logger.bind(
+                    method=scope["method"],
+                    path=scope["path"],
+                    status=status_code,
+                    duration_ms=round(elapsed_ms, 1),
+                    source=source,
+                ).info(
+                    "{} {} {} {:.1f}ms{}",
+                    scope["method"],
+                    scope["path"],
+                    status_code,
+                    elapsed_ms,
+                    f" source={source}" if source else "",
+                )
@@ -1,8 +1,35 @@
 from loguru import logger
 import sys
+from pathlib import Path
+
+from app.services.config import settings
 
 # Remove all existing handlers
 logger.remove()
 
-# Configure logger
-logger.add(sys.stdout, level="INFO", format="{time} - {name} - {level} - {message}")
+# Configure logger. With LOG_ENQUEUE, records are written by a background
+# thread so slow stdout consumers don't stall the event loop
+logger.add(
+    sys.stdout,
+    level=settings.LOG_LEVEL,
+    format="{time} - {name} - {level} - {message}",
+    enqueue=settings.LOG_ENQUEUE,
+    serialize=settings.LOG_JSON,
+)
+
+
+def add_file_sink(logs_dir: Path):
+    """
+    Also write log records to a rotated file in `logs_dir`. The app calls this
+    at startup, so importing its modules doesn't touch the file system.
+    """
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    logger.add(
+        logs_dir / "app.log",
+        level=settings.LOG_LEVEL,
+        rotation=settings.LOG_FILE_ROTATION,
+        retention="10 days",
+        compression="zip",
+        enqueue=settings.LOG_ENQUEUE,
+        serialize=settings.LOG_JSON,
+    )
@@ -0,0 +1,123 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from prometheus_client import Counter, Histogram
+
+# Latency buckets in seconds, from sub-millisecond lookups to slow LLM calls
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+STAGE_LATENCY = Histogram(
+    "askme_stage_duration_seconds",
+    "Time spent in each stage of the question answering path.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_LATENCY = Histogram(
+    "askme_request_duration_seconds",
+    "End-to-end handling time of the question endpoints.",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+ANSWERS = Counter(
+    "askme_answers_total",
+    "Answers returned, by source (Local FAQ, Cached LLM, OpenAI).",
+    ["source"],
+)
+CACHE_REQUESTS = Counter(
+    "askme_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss).",
+    ["cache", "result"],
+)
+QUERY_LOG_DROPPED = Counter(
+    "askme_query_log_dropped_total",
+    "Query log entries dropped because the queue was full or a write failed.",
+)
+COALESCED_REQUESTS = Counter(
+    "askme_coalesced_requests_total",
+    "Calls that joined an identical in-flight execution instead of starting one.",
+)
+SHED_REQUESTS = Counter(
+    "askme_shed_requests_total",
+    "Requests rejected by the rate limiter or an overloaded stage, by reason.",
+    ["reason"],
+)
+
+# Stage timings of the current request, used for the Server-Timing header
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def start_request_timings() -> Dict[str, float]:
+    """
+    Start collecting stage timings for the current request.
+    """
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Record the duration of a stage in the stage histogram and, when the
+    current request collects timings, in its Server-Timing entries.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_LATENCY.labels(stage).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def current_timings() -> Dict[str, float]:
+    """
+    Stage timings collected so far for the current request (empty outside one).
+    """
+    return dict(_request_timings.get() or {})
+
+
+def add_timings(stages: Dict[str, float]):
+    """
+    Add stages timed elsewhere, e.g. in a run shared with other requests, to
+    the current request's timings.
+    """
+    timings = _request_timings.get()
+    if timings is not None:
+        for stage, elapsed in stages.items():
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """
+    Format stage timings as a Server-Timing header value (durations in ms).
+    """
+    return ", ".join(
+        f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in timings.items()
+    )
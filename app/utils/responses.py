@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+from typing import Optional
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.services.cache import TTLCache
+from app.services.config import settings
+
+
+def etag_for(body: bytes) -> str:
+    """
+    Strong ETag derived from the response body.
+    """
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Whether an If-None-Match header lists the ETag (or is `*`), compared
+    weakly as RFC 9110 requires for this header.
+    """
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (
+        tag.removeprefix("W/") for tag in tags
+    )
+
+
+def gzip_accepted(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "")
+
+
+# A local FAQ answer, serialized once and reused for every question it answers
+class FAQResponse(dict):
+    """
+    Behaves as the usual response dict (batch and streaming responses embed it
+    as such), and also carries its JSON body, ETag and, once a client asked
+    for it, its gzipped body.
+    """
+
+    def __init__(self, question: str, answer: str):
+        super().__init__(source="Local FAQ", matched_question=question, answer=answer)
+        self.body = orjson.dumps(self)
+        self.etag = etag_for(self.body)
+        self._gzipped: Optional[bytes] = None
+
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=settings.GZIP_LEVEL)
+        return self._gzipped
+
+    def to_response(self, request: Request) -> Response:
+        """
+        HTTP response for the answer; clients may reuse it for
+        FAQ_RESPONSE_MAX_AGE seconds and compare ETags to detect changes.
+        """
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": f"private, max-age={settings.FAQ_RESPONSE_MAX_AGE}",
+            "Vary": "Accept-Encoding",
+        }
+        body = self.body
+        if len(body) >= settings.GZIP_MINIMUM_SIZE and gzip_accepted(request):
+            body = self.gzipped()
+            headers["Content-Encoding"] = "gzip"
+            # Strong ETags differ per encoding
+            headers["ETag"] = f'{self.etag[:-1]}-gzip"'
+        return Response(body, media_type="application/json", headers=headers)
+
+
+# Prepared responses of the local FAQ answers, keyed by FAQ id
+class FAQResponseCache:
+    def __init__(self, capacity: int):
+        self._entries = TTLCache(capacity)
+
+    def get(self, faq_entry: dict) -> FAQResponse:
+        """
+        The prepared response for a FAQ match, built on first use. An entry
+        whose question or answer no longer matches the FAQ is rebuilt.
+        """
+        response = self._entries.get(faq_entry["id"])
+        if (
+            response is None
+            or response["answer"] != faq_entry["answer"]
+            or response["matched_question"] != faq_entry["question"]
+        ):
+            response = FAQResponse(faq_entry["question"], faq_entry["answer"])
+            self._entries.set(faq_entry["id"], response)
+        return response
+
+    def invalidate(self, faq_ids):
+        for faq_id in faq_ids:
+            self._entries.pop(faq_id)
+
+
+# Instantiate the prepared FAQ response cache
+faq_responses = FAQResponseCache(settings.FAQ_RESPONSE_CACHE_SIZE)
@@ -0,0 +1,64 @@
+"""
+Gunicorn configuration for production: one uvicorn worker per CPU core, no
+reload. The master prepares the state shared by all workers before forking:
+the memory-mapped vector index snapshot file and the Prometheus multiprocess
+directory.
+
+    gunicorn app.main:app -c gunicorn.conf.py
+"""
+
+import asyncio
+import multiprocessing
+import os
+import shutil
+from pathlib import Path
+
+from app.services.config import settings
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = settings.WEB_CONCURRENCY or multiprocessing.cpu_count()
+# Keep connections from a load balancer open between requests
+keepalive = 5
+# OpenAI fallbacks can take tens of seconds
+timeout = 120
+graceful_timeout = 30
+
+# Workers record metrics in per-process files that /metrics aggregates. Set
+# here, before any worker imports prometheus_client.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/askme_metrics")
+
+
+def on_starting(server):
+    """
+    Runs once in the master before any worker is started.
+    """
+    # Per-process metric files are aggregated by /metrics; start from a clean slate
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+    # Export the index snapshot once if initialize_embeddings.py has not; the
+    # workers memory-map it instead of each loading every embedding from the
+    # database
+    if settings.VECTOR_BACKEND.lower() == "memory" and settings.VECTOR_INDEX_PATH:
+        from app.services.snapshot import Snapshot, SnapshotError
+
+        path = Path(settings.VECTOR_INDEX_PATH)
+        try:
+            stale = Snapshot(path).embeddings_model != settings.EMBEDDING_SPACE
+        except SnapshotError:
+            stale = True
+        if stale:
+            from app.scripts.export_vector_index import export_vector_index
+
+            asyncio.run(export_vector_index(path))
+
+
+def child_exit(server, worker):
+    """
+    Drop the live metric files of a worker that exited.
+    """
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,113 @@
+import argparse
+import itertools
+import json
+import random
+from typing import Iterator
+
+# Building blocks combined into unique, FAQ-like questions. The product of the
+# lists below gives 25,600 distinct questions; larger corpora repeat it with a
+# reference suffix per pass.
+OPENERS = [
+    "How do I",
+    "How can I",
+    "What is the best way to",
+    "Is it possible to",
+    "Where can I",
+    "What steps should I take to",
+    "Can I",
+    "Why can't I",
+]
+ACTIONS = [
+    "update",
+    "reset",
+    "delete",
+    "export",
+    "enable",
+    "disable",
+    "link",
+    "verify",
+    "change",
+    "recover",
+    "share",
+    "download",
+    "restore",
+    "configure",
+    "review",
+    "cancel",
+]
+OBJECTS = [
+    "my username",
+    "my password",
+    "my email address",
+    "two-factor authentication",
+    "dark mode",
+    "my billing details",
+    "my subscription",
+    "my profile picture",
+    "notification settings",
+    "my user data",
+    "biometric login",
+    "my API token",
+    "team permissions",
+    "my payment method",
+    "email digests",
+    "my linked devices",
+    "my privacy settings",
+    "the mobile app",
+    "my invoices",
+    "my security questions",
+]
+CONTEXTS = [
+    "",
+    "on the mobile app",
+    "from the web dashboard",
+    "for my whole team",
+    "without contacting support",
+    "after changing my phone",
+    "on a shared account",
+    "while traveling abroad",
+    "for a deactivated account",
+    "in the desktop client",
+]
+
+
+def generate_faqs(count: int, seed: int = 42) -> Iterator[dict]:
+    """
+    Yield `count` synthetic FAQ entries with unique questions. Entries are
+    produced lazily so even a million-row corpus streams in constant memory.
+    """
+    combinations = itertools.product(OPENERS, ACTIONS, OBJECTS, CONTEXTS)
+    rng = random.Random(seed)
+
+    produced = 0
+    for round_number in itertools.count():
+        for opener, action, obj, context in combinations:
+            if produced >= count:
+                return
+            question = " ".join(filter(None, [opener, action, obj, context])) + "?"
+            if round_number:
+                # Past the first pass, suffix a reference so questions stay unique
+                question = f"{question[:-1]} (ref {round_number})?"
+            answer = (
+                f"Open your account settings, choose '{obj.title()}', "
+                f"select '{action.title()}' and follow the prompts. "
+                f"Reference #{rng.randrange(10**6):06d}."
+            )
+            yield {"question": question, "answer": answer}
+            produced += 1
+        combinations = itertools.product(OPENERS, ACTIONS, OBJECTS, CONTEXTS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic FAQ corpus as JSONL (loadable by load_faq_data.py)."
+    )
+    parser.add_argument("path", help="Output JSONL file.")
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with open(args.path, "w", encoding="utf-8") as f:
+        for faq in generate_faqs(args.count, args.seed):
+            f.write(json.dumps(faq) + "\n")
+    print(f"Wrote {args.count} FAQ entries to {args.path}.")
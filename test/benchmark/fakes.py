@@ -0,0 +1,96 @@
+import asyncio
+import hashlib
+import re
+from functools import lru_cache
+from typing import AsyncIterator, List
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=65536)
+def _token_vector(token: str, dim: int) -> np.ndarray:
+    # Seed from a stable hash so vectors are identical across runs and processes
+    seed = int.from_bytes(hashlib.md5(token.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+class FakeEmbeddings:
+    """
+    Deterministic stand-in for OpenAIEmbeddings. Each text is embedded as the
+    normalized sum of per-token random vectors, so texts sharing words end up
+    close together, like paraphrases with a real model. `latency` seconds are
+    slept per call to emulate the network round trip.
+    """
+
+    def __init__(self, dim: int = 1536, latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+        self.calls = 0
+
+    def embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            vector += _token_vector(token, self.dim)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return self.embed(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        return [self.embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self.embed(text) for text in texts]
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeChatModel:
+    """
+    Deterministic stand-in for ChatOpenAI. Answers echo the question; `latency`
+    is the time to the first token and `token_latency` the delay between the
+    streamed tokens.
+    """
+
+    def __init__(self, latency: float = 0.0, token_latency: float = 0.0, tokens: int = 20):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.tokens = tokens
+        self.calls = 0
+
+    def _answer_tokens(self, messages) -> List[str]:
+        question = messages[-1].content
+        return [f"Answer to '{question}':"] + [f" token{i}" for i in range(self.tokens)]
+
+    async def ainvoke(self, messages) -> FakeMessage:
+        self.calls += 1
+        tokens = self._answer_tokens(messages)
+        await asyncio.sleep(self.latency + self.token_latency * len(tokens))
+        return FakeMessage("".join(tokens))
+
+    async def astream(self, messages) -> AsyncIterator[FakeMessage]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for token in self._answer_tokens(messages):
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield FakeMessage(token)
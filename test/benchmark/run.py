@@ -0,0 +1,378 @@
+"""
+Offline benchmarks for AskMe. They need no network, no OpenAI key and no
+Postgres: embeddings and chat completions come from the deterministic fakes in
+fakes.py (with configurable injected latency) and similarity search runs on the
+in-memory vector index.
+
+Usage (from the repository root):
+    python -m test.benchmark.run search --rows 100000 --dim 1536
+    python -m test.benchmark.run snapshot --rows 100000
+    python -m test.benchmark.run recall --rows 50000 --k 5
+    python -m test.benchmark.run ingest --rows 1000000
+    python -m test.benchmark.run request --rows 10000 --requests 2000 --concurrency 50
+    python -m test.benchmark.run all
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    return {
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "mean": sum(ordered) / len(ordered),
+    }
+
+
+def report(name: str, samples: List[float], elapsed: float, extra: str = ""):
+    stats = percentiles(samples)
+    print(
+        f"{name:<28} n={len(samples):<8} "
+        f"p50={stats['p50'] * 1000:8.3f}ms p95={stats['p95'] * 1000:8.3f}ms "
+        f"p99={stats['p99'] * 1000:8.3f}ms  {len(samples) / elapsed:10.1f} ops/sec"
+        + (f"  {extra}" if extra else "")
+    )
+
+
+def bench_search(args):
+    """
+    Single and batched top-k queries against the in-memory vector index.
+    """
+    import numpy as np
+    from app.services.vector_index import InMemoryVectorIndex
+
+    rng = np.random.default_rng(args.seed)
+    matrix = rng.standard_normal((args.rows, args.dim), dtype=np.float32)
+
+    index = InMemoryVectorIndex()
+    started = time.perf_counter()
+    index.build(
+        np.arange(1, args.rows + 1),
+        [""] * args.rows,
+        [""] * args.rows,
+        matrix,
+    )
+    print(f"Built index of {args.rows}x{args.dim} in {time.perf_counter() - started:.2f}s")
+    del matrix
+
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    samples = []
+    started = time.perf_counter()
+    for query in queries:
+        t0 = time.perf_counter()
+        index.search(query, k=args.k)
+        samples.append(time.perf_counter() - t0)
+    report(f"search top-{args.k}", samples, time.perf_counter() - started)
+
+    batch_size = 32
+    samples = []
+    started = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        t0 = time.perf_counter()
+        index.search_batch(queries[i : i + batch_size], k=args.k)
+        samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    report(
+        f"search_batch x{batch_size}",
+        samples,
+        elapsed,
+        f"({len(queries) / elapsed:.1f} queries/sec)",
+    )
+
+
+def bench_snapshot(args):
+    """
+    Exporting the index as a snapshot file and mapping it again, per dtype:
+    the warm start of a worker with VECTOR_INDEX_PATH set.
+    """
+    import numpy as np
+    from app.services.vector_index import InMemoryVectorIndex
+
+    rng = np.random.default_rng(args.seed)
+    index = InMemoryVectorIndex()
+    index.build(
+        np.arange(1, args.rows + 1),
+        [f"Question {i}?" for i in range(args.rows)],
+        [f"Answer {i}." for i in range(args.rows)],
+        rng.standard_normal((args.rows, args.dim), dtype=np.float32),
+    )
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype in ("float32", "float16"):
+            path = Path(tmp) / f"index.{dtype}.snapshot"
+            started = time.perf_counter()
+            index.save(path, dtype)
+            exported = time.perf_counter() - started
+
+            mapped = InMemoryVectorIndex(str(path))
+            started = time.perf_counter()
+            mapped.open(path)
+            opened = time.perf_counter() - started
+            print(
+                f"snapshot {dtype:<8} size={path.stat().st_size / 2**20:8.1f}MB "
+                f"export={exported:.2f}s open={opened * 1000:.3f}ms"
+            )
+
+            samples = []
+            started = time.perf_counter()
+            for query in queries:
+                t0 = time.perf_counter()
+                mapped.search(query, k=args.k)
+                samples.append(time.perf_counter() - t0)
+            report(f"mapped {dtype} top-{args.k}", samples, time.perf_counter() - started)
+
+
+def bench_recall(args):
+    """
+    Recall@k and latency of the compressed search options against exact float32
+    search over full-dimension embeddings. Queries are paraphrases of corpus
+    questions (a word dropped, a word added), embedded with the fake model.
+    """
+    import numpy as np
+    from app.services.vector_index import InMemoryVectorIndex
+    from test.benchmark.corpus import generate_faqs
+    from test.benchmark.fakes import FakeEmbeddings
+
+    model = FakeEmbeddings(dim=args.dim)
+    faqs = list(generate_faqs(args.rows, args.seed))
+    matrix = np.asarray([model.embed(faq["question"]) for faq in faqs], dtype=np.float32)
+
+    rng = random.Random(args.seed)
+    queries = []
+    for _ in range(args.queries):
+        words = rng.choice(faqs)["question"].rstrip("?").split()
+        del words[rng.randrange(len(words))]
+        words.insert(rng.randrange(len(words) + 1), rng.choice(["please", "now", "quickly"]))
+        queries.append(model.embed(" ".join(words) + "?"))
+    queries = np.asarray(queries, dtype=np.float32)
+
+    def make_index(dims: int, precision: str = "float32", rescore_factor: int = 10):
+        # Shortened embeddings are the leading dimensions, renormalized by build()
+        index = InMemoryVectorIndex(precision=precision, rescore_factor=rescore_factor)
+        index.build(np.arange(len(faqs)), [""] * len(faqs), [""] * len(faqs), matrix[:, :dims])
+        return index
+
+    exact = make_index(args.dim)
+    truth = [{hit["id"] for hit in exact.search(query, k=args.k)} for query in queries]
+
+    options = [("float32 (exact)", args.dim, "float32", 1)]
+    options += [("float16", args.dim, "float16", 1)]
+    options += [(f"dims={dims}", dims, "float32", 1) for dims in (768, 512, 256) if dims < args.dim]
+    options += [(f"binary rescore x{f}", args.dim, "binary", f) for f in (1, 4, 10, 40)]
+
+    for name, dims, precision, rescore_factor in options:
+        index = make_index(dims, precision, rescore_factor)
+        # Binary codes come on top of the matrix, which is kept for rescoring
+        memory = index.matrix.nbytes + (index.codes.nbytes if index.codes is not None else 0)
+        samples, hits = [], 0
+        started = time.perf_counter()
+        for query, expected in zip(queries, truth):
+            t0 = time.perf_counter()
+            found = index.search(query[:dims], k=args.k)
+            samples.append(time.perf_counter() - t0)
+            hits += len(expected & {hit["id"] for hit in found})
+        report(
+            f"{name}",
+            samples,
+            time.perf_counter() - started,
+            f"recall@{args.k}={hits / (len(queries) * args.k):.3f} "
+            f"search_memory={memory / 2**20:.1f}MB",
+        )
+
+
+def bench_ingest(args):
+    """
+    The in-process half of load_faq_data.py: streaming the input file and
+    deduplicating on the question hash. The COPY into Postgres is not included.
+    """
+    from app.scripts.load_faq_data import iter_faq_entries
+    from test.benchmark.corpus import generate_faqs
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ("jsonl", "json"):
+            path = os.path.join(tmp, f"faqs.{fmt}")
+            with open(path, "w", encoding="utf-8") as f:
+                faqs = generate_faqs(args.rows, args.seed)
+                if fmt == "jsonl":
+                    for faq in faqs:
+                        f.write(json.dumps(faq) + "\n")
+                else:
+                    f.write("[\n")
+                    for i, faq in enumerate(faqs):
+                        f.write(("," if i else "") + json.dumps(faq) + "\n")
+                    f.write("]\n")
+
+            seen = set()
+            samples = []
+            batch = 0
+            started = time.perf_counter()
+            t0 = started
+            for faq in iter_faq_entries(path):
+                seen.add(hashlib.md5(faq["question"].encode("utf-8")).hexdigest())
+                batch += 1
+                if batch == 5000:
+                    samples.append(time.perf_counter() - t0)
+                    t0 = time.perf_counter()
+                    batch = 0
+            elapsed = time.perf_counter() - started
+            report(
+                f"ingest parse+dedup ({fmt})",
+                samples or [elapsed],
+                elapsed,
+                f"({len(seen) / elapsed:.0f} rows/sec, per 5000-row batch)",
+            )
+
+
+async def _run_requests(args):
+    import httpx
+    import numpy as np
+    from app.main import app
+    from app.services.embeddings import embedding_service
+    from app.services.openai_client import openai_client
+    from app.services.vector_index import vector_index
+    from test.benchmark.corpus import generate_faqs
+    from test.benchmark.fakes import FakeChatModel, FakeEmbeddings
+
+    embeddings_model = FakeEmbeddings(dim=args.dim, latency=args.embed_latency)
+    chat_model = FakeChatModel(latency=args.llm_latency)
+    embedding_service.embeddings_model = embeddings_model
+    openai_client.chat_model = chat_model
+
+    faqs = list(generate_faqs(args.rows, args.seed))
+    started = time.perf_counter()
+    vector_index.build(
+        range(1, len(faqs) + 1),
+        [faq["question"] for faq in faqs],
+        [faq["answer"] for faq in faqs],
+        np.asarray([embeddings_model.embed(faq["question"]) for faq in faqs]),
+    )
+    print(f"Indexed {len(faqs)} synthetic FAQs in {time.perf_counter() - started:.2f}s")
+
+    # Mix questions straight from the corpus (local hits) with novel ones
+    # (OpenAI fallbacks) in the requested proportion
+    rng = random.Random(args.seed)
+    questions = [
+        f"Something unrelated number {i}?"
+        if rng.random() < args.fallback_share
+        else rng.choice(faqs)["question"]
+        for i in range(args.requests)
+    ]
+
+    headers = {"Authorization": f"Bearer {os.environ['API_TOKEN']}"}
+    samples: List[float] = []
+    sources: Counter = Counter()
+    queue = iter(questions)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def worker():
+            for question in queue:
+                t0 = time.perf_counter()
+                response = await client.post(
+                    "/ask-question", json={"user_question": question}, headers=headers
+                )
+                samples.append(time.perf_counter() - t0)
+                sources[response.json().get("source", response.status_code)] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    report(
+        f"request x{args.concurrency} concurrent",
+        samples,
+        elapsed,
+        f"sources={dict(sources)} embed_calls={embeddings_model.calls} "
+        f"llm_calls={chat_model.calls}",
+    )
+
+
+def bench_request(args):
+    """
+    The full /ask-question path through the ASGI app with fake OpenAI backends.
+    """
+    asyncio.run(_run_requests(args))
+
+
+BENCHMARKS = {
+    "search": bench_search,
+    "snapshot": bench_snapshot,
+    "recall": bench_recall,
+    "ingest": bench_ingest,
+    "request": bench_request,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline AskMe benchmarks.")
+    parser.add_argument("benchmark", choices=[*BENCHMARKS, "all"])
+    parser.add_argument("--rows", type=int, default=10000, help="Corpus size.")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension.")
+    parser.add_argument("--queries", type=int, default=1000, help="Search queries.")
+    parser.add_argument("--k", type=int, default=5, help="Top-k for searches.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--embed-latency", type=float, default=0.05, help="Injected seconds per embedding call."
+    )
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.5, help="Injected seconds per chat completion."
+    )
+    parser.add_argument(
+        "--fallback-share",
+        type=float,
+        default=0.2,
+        help="Share of requests that miss the FAQ and fall back to the LLM.",
+    )
+    parser.add_argument(
+        "--with-caches",
+        action="store_true",
+        help="Keep the embedding and answer caches enabled in the request benchmark.",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Configure the app for an offline run before any app module reads settings
+    os.environ.setdefault("VECTOR_BACKEND", "memory")
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("API_TOKEN", "benchmark")
+    os.environ.setdefault("FAQ_CHANGE_FEED", "false")
+    if not args.with_caches:
+        os.environ["EMBEDDING_CACHE_SIZE"] = "0"
+        os.environ["EMBEDDING_CACHE_PATH"] = ""
+        os.environ["ANSWER_CACHE_SIZE"] = "0"
+
+    # Keep per-request logging out of the measurements
+    from app.utils.logger import logger
+    import app.main  # noqa: F401  (registers the app's log sinks, removed below)
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    selected = BENCHMARKS if args.benchmark == "all" else [args.benchmark]
+    for name in selected:
+        BENCHMARKS[name](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+import os
+
+# Configure the app for offline tests before any app module reads settings
+os.environ.setdefault("VECTOR_BACKEND", "memory")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("API_TOKEN", "test")
+os.environ.setdefault("FAQ_CHANGE_FEED", "false")
+os.environ.setdefault("QUERY_LOG", "off")
+os.environ["EMBEDDING_CACHE_SIZE"] = "0"
+os.environ["EMBEDDING_CACHE_PATH"] = ""
+os.environ["ANSWER_CACHE_SIZE"] = "0"
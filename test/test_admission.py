@@ -0,0 +1,92 @@
+import asyncio
+import random
+
+import pytest
+
+from app.services import admission
+from app.services.admission import Overloaded, RateLimiter, StageLimiter
+
+
+def test_timed_out_waits_do_not_leak_slots():
+    async def run():
+        limiter = StageLimiter("test", limit=4, queue_size=1000, queue_timeout=0.001)
+        rng = random.Random(0)
+
+        async def call():
+            try:
+                async with limiter.slot():
+                    await asyncio.sleep(rng.random() * 0.002)
+            except Overloaded:
+                pass
+
+        async def cancelled_call():
+            task = asyncio.ensure_future(call())
+            await asyncio.sleep(rng.random() * 0.002)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        for _ in range(20):
+            await asyncio.gather(
+                *(call() for _ in range(100)), *(cancelled_call() for _ in range(20))
+            )
+        # Let abandoned acquisitions settle
+        await asyncio.sleep(0.01)
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter._semaphore._value == limiter.limit
+    assert limiter.waiting == 0
+
+
+def test_full_queue_is_rejected():
+    async def run():
+        limiter = StageLimiter("test", limit=1, queue_size=0, queue_timeout=1)
+        async with limiter.slot():
+            assert limiter.saturated
+            with pytest.raises(Overloaded):
+                async with limiter.slot():
+                    pass
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter._semaphore._value == 1
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_rate_limiter_allows_a_burst_then_refills(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    limiter = RateLimiter(per_minute=30, burst=3)
+
+    assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+    # One request every 2 seconds
+    assert limiter.acquire("a") == 2
+    assert limiter.acquire("b") == 0
+
+    clock.now += 2
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 2
+
+
+def test_rate_limiter_charges_batches_by_size(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    limiter = RateLimiter(per_minute=60, burst=10)
+
+    assert limiter.acquire("a", cost=8) == 0
+    assert limiter.acquire("a", cost=5) == 3
+    # A batch larger than the burst waits for a full bucket instead of forever
+    assert limiter.acquire("b", cost=50) == 0
+
+
+def test_disabled_rate_limiter_allows_everything():
+    limiter = RateLimiter(per_minute=0, burst=1)
+
+    assert all(limiter.acquire("a") == 0 for _ in range(100))
@@ -0,0 +1,92 @@
+import asyncio
+
+import numpy as np
+
+from app.services.ask import ask_service
+from app.services.config import settings
+from app.services.embeddings import embedding_service
+from app.services.openai_client import openai_client
+from app.services.query_log import query_log
+from app.services.vector_index import vector_index
+from app.utils.metrics import start_request_timings
+from test.benchmark.fakes import FakeChatModel, FakeEmbeddings
+
+FAQS = [
+    ("How do I reset my password?", "Use the reset link on the sign-in page."),
+    ("How do I delete my account?", "Open the account settings and choose Delete."),
+]
+
+
+def set_up_fakes(llm_latency: float = 0.05):
+    embeddings_model = FakeEmbeddings(dim=settings.EMBEDDING_DIMENSIONS)
+    chat_model = FakeChatModel(latency=llm_latency)
+    embedding_service.embeddings_model = embeddings_model
+    openai_client.chat_model = chat_model
+    vector_index.build(
+        range(1, len(FAQS) + 1),
+        [question for question, _ in FAQS],
+        [answer for _, answer in FAQS],
+        np.asarray([embeddings_model.embed(question) for question, _ in FAQS]),
+    )
+    return chat_model
+
+
+def test_single_and_batch_requests_share_one_llm_call():
+    chat_model = set_up_fakes()
+    question = "Which planets have rings?"
+
+    async def run():
+        return await asyncio.gather(
+            ask_service.answer(question),
+            ask_service.answer_batch([question.upper(), "How do I reset my password?"]),
+        )
+
+    single, batch = asyncio.run(run())
+
+    assert chat_model.calls == 1
+    assert single["source"] == "OpenAI"
+    assert batch[0]["answer"] == single["answer"]
+    assert batch[1]["source"] == "Local FAQ"
+
+
+def test_coalesced_requests_are_logged_once_each():
+    chat_model = set_up_fakes()
+    question = "What is the speed of light?"
+
+    async def run():
+        query_log._queue = asyncio.Queue()
+        try:
+            await asyncio.gather(*(ask_service.answer(question) for _ in range(5)))
+            return [query_log._queue.get_nowait() for _ in range(query_log._queue.qsize())]
+        finally:
+            query_log._queue = None
+
+    entries = asyncio.run(run())
+
+    assert chat_model.calls == 1
+    assert len(entries) == 5
+    assert {entry["source"] for entry in entries} == {"OpenAI"}
+
+
+def test_coalesced_requests_are_logged_with_the_shared_timings():
+    set_up_fakes()
+    question = "How far away is the moon?"
+
+    async def ask():
+        start_request_timings()
+        return await ask_service.answer(question)
+
+    async def run():
+        query_log._queue = asyncio.Queue()
+        try:
+            await asyncio.gather(*(ask() for _ in range(3)))
+            return [query_log._queue.get_nowait() for _ in range(query_log._queue.qsize())]
+        finally:
+            query_log._queue = None
+
+    entries = asyncio.run(run())
+
+    assert len(entries) == 3
+    for entry in entries:
+        assert {"embedding", "vector_search", "llm"} <= set(entry["timings"])
+        assert entry["timings"]["llm"] >= 0.05
@@ -0,0 +1,159 @@
+import asyncio
+from array import array
+
+from app.services import cache
+from app.services.cache import (
+    EmbeddingCache,
+    SemanticAnswerCache,
+    SQLiteEmbeddingStore,
+    TTLCache,
+)
+from app.services.config import settings
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_cache_evicts_the_least_recently_used():
+    lru = TTLCache(2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+    assert (lru.hits, lru.misses) == (3, 1)
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    lru = TTLCache(10, ttl=60)
+    lru.set("a", 1)
+
+    clock.now += 59
+    assert lru.get("a") == 1
+    clock.now += 2
+    assert lru.get("a") is None
+    assert len(lru) == 0
+
+
+def test_sqlite_store_round_trip_and_ttl(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    store = SQLiteEmbeddingStore(str(tmp_path / "cache.sqlite"), max_entries=100, ttl=60)
+
+    async def run():
+        store.set_many([("a", array("f", [1.0, 2.0])), ("b", array("f", [3.0]))])
+        # Writes and lookups share the store's thread, so the lookup sees the batch
+        found = await store.get_many(["a", "b", "c"])
+        clock.now += 61
+        expired = await store.get_many(["a"])
+        return found, expired
+
+    found, expired = asyncio.run(run())
+
+    assert {key: value.tolist() for key, value in found.items()} == {
+        "a": [1.0, 2.0],
+        "b": [3.0],
+    }
+    assert expired == {}
+
+
+def test_sqlite_store_prunes_the_oldest_entries(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    store = SQLiteEmbeddingStore(str(tmp_path / "cache.sqlite"), max_entries=500)
+
+    async def run():
+        for batch in range(2):
+            clock.now += 1
+            store.set_many([(f"{batch}-{i}", array("f", [1.0])) for i in range(500)])
+        return await store.get_many(["0-0", "1-0"])
+
+    found = asyncio.run(run())
+
+    assert sorted(found) == ["1-0"]
+
+
+def test_embedding_cache_falls_back_to_the_persistent_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_SIZE", 10)
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+
+    async def run():
+        writer = EmbeddingCache()
+        writer.set_many([("How do I reset my password?", [0.5, 0.25])])
+        await writer.store.get_many([])  # Wait for the queued write
+        # A fresh process: empty memory tier, same file
+        reader = EmbeddingCache()
+        return await reader.get_many(["how do I  RESET my password?", "Other?"]), reader
+
+    (found, missing), reader = asyncio.run(run())
+
+    assert found == [0.5, 0.25]
+    assert missing is None
+    assert len(reader.memory) == 1
+
+
+def test_answer_cache_matches_similar_questions():
+    answers = SemanticAnswerCache(capacity=4, threshold=0.9)
+    answers.set("Which planets have rings?", [1.0, 0.0, 0.0], "Saturn, among others.")
+
+    # Scaled copies are the same direction
+    hit = answers.get([2.0, 0.1, 0.0])
+    assert hit["answer"] == "Saturn, among others."
+    assert hit["similarity_score"] > 0.99
+    assert answers.get([0.0, 1.0, 0.0]) is None
+    assert answers.get([1.0, 0.0]) is None
+    assert (answers.hits, answers.misses) == (1, 2)
+
+
+def test_answer_cache_evicts_the_least_recently_used(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    answers = SemanticAnswerCache(capacity=2, threshold=0.9)
+    answers.set("a", [1.0, 0.0, 0.0], "A")
+    clock.now += 1
+    answers.set("b", [0.0, 1.0, 0.0], "B")
+    clock.now += 1
+    answers.get([1.0, 0.0, 0.0])
+    clock.now += 1
+    answers.set("c", [0.0, 0.0, 1.0], "C")
+
+    assert answers.get([0.0, 1.0, 0.0]) is None
+    assert answers.get([1.0, 0.0, 0.0])["answer"] == "A"
+    assert answers.get([0.0, 0.0, 1.0])["answer"] == "C"
+
+
+def test_answer_cache_expires_entries(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    answers = SemanticAnswerCache(capacity=2, threshold=0.9, ttl=60)
+    answers.set("a", [1.0, 0.0], "A")
+
+    clock.now += 61
+    assert answers.get([1.0, 0.0]) is None
+    assert len(answers) == 0
+
+
+def test_invalidate_similar_drops_only_close_answers():
+    answers = SemanticAnswerCache(capacity=4, threshold=0.9)
+    answers.set("a", [1.0, 0.0, 0.0], "A")
+    answers.set("b", [0.8, 0.6, 0.0], "B")
+    answers.set("c", [0.0, 0.0, 1.0], "C")
+
+    # A new FAQ close to "a" (similarity 1.0) and "b" (0.8), not "c" (0.0)
+    dropped = answers.invalidate_similar([[1.0, 0.0, 0.0], [1.0]], threshold=0.75)
+
+    assert dropped == 2
+    assert len(answers) == 1
+    assert answers.get([1.0, 0.0, 0.0]) is None
+    assert answers.get([0.0, 0.0, 1.0])["answer"] == "C"
+    assert answers.invalidate_similar([], threshold=0.75) == 0
@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import faq_sync
+from app.services.cache import SemanticAnswerCache
+from app.services.config import settings
+from app.services.faq_sync import FAQChangeFeed
+from app.services.lexical import BM25Index
+from app.services.vector_index import InMemoryVectorIndex
+from app.utils.responses import FAQResponseCache
+
+FAQS = {
+    1: ("How do I reset my password?", "Use the reset link.", [1.0, 0.0, 0.0]),
+    2: ("How do I delete my account?", "Open the account settings.", [0.0, 1.0, 0.0]),
+    3: ("Where is my invoice?", "Under Billing.", [0.0, 0.0, 1.0]),
+}
+
+
+def row(faq_id, question, answer, embedding, embedded=True):
+    return SimpleNamespace(
+        id=faq_id,
+        question=question,
+        answer=answer,
+        embedding=embedding,
+        embedding_model=settings.EMBEDDING_SPACE,
+        question_hash=question,
+        # An edited question waits for its new embedding
+        embedding_hash=question if embedded else "previous question",
+    )
+
+
+@pytest.fixture
+def indexes(monkeypatch):
+    vectors = InMemoryVectorIndex()
+    vectors.build(
+        list(FAQS),
+        [question for question, _, _ in FAQS.values()],
+        [answer for _, answer, _ in FAQS.values()],
+        [embedding for _, _, embedding in FAQS.values()],
+    )
+    lexical = BM25Index()
+    lexical.build((faq_id, question) for faq_id, (question, _, _) in FAQS.items())
+    answers = SemanticAnswerCache(capacity=4, threshold=0.9)
+    responses = FAQResponseCache(10)
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "memory")
+    monkeypatch.setattr(settings, "SIMILARITY_THRESHOLD", 0.8)
+    monkeypatch.setattr(faq_sync, "vector_index", vectors)
+    monkeypatch.setattr(faq_sync, "lexical_index", lexical)
+    monkeypatch.setattr(faq_sync, "answer_cache", answers)
+    monkeypatch.setattr(faq_sync, "faq_responses", responses)
+    return SimpleNamespace(vectors=vectors, lexical=lexical, answers=answers, responses=responses)
+
+
+def best_id(index, embedding):
+    results = index.search(embedding, k=1)
+    return results[0]["id"] if results else None
+
+
+def test_apply_updates_inserts_and_deletes(indexes):
+    FAQChangeFeed().apply(
+        [
+            row(1, "How can I change my password?", "Use the reset link.", [0.0, 0.6, 0.8]),
+            row(4, "Can I pay by card?", "Yes.", [0.6, 0.0, 0.8]),
+        ],
+        [2],
+    )
+
+    assert best_id(indexes.vectors, [0.0, 0.6, 0.8]) == 1
+    assert best_id(indexes.vectors, [0.6, 0.0, 0.8]) == 4
+    assert indexes.vectors.vector(2) is None
+    assert indexes.lexical.score("change password", [1]) != [0.0]
+    assert indexes.lexical.score("delete account", [2]) == [0.0]
+
+
+def test_apply_takes_edited_faqs_out_until_embedded(indexes):
+    FAQChangeFeed().apply(
+        [row(1, "How can I change my password?", "Use the reset link.", None, embedded=False)],
+        [],
+    )
+
+    assert indexes.vectors.vector(1) is None
+    assert best_id(indexes.vectors, [1.0, 0.0, 0.0]) != 1
+    # The lexical index already matches the edited question
+    assert indexes.lexical.score("change", [1]) != [0.0]
+
+
+def test_apply_drops_answers_near_the_old_and_new_versions(indexes):
+    answers = indexes.answers
+    answers.set("Forgot my password", [0.99, 0.1, 0.0], "Old answer near FAQ 1")
+    answers.set("Close my account", [0.1, 0.99, 0.0], "Old answer near FAQ 2")
+    answers.set("Do you ship abroad?", [0.0, -1.0, 0.0], "Unrelated")
+    indexes.responses.get({"id": 1, "question": FAQS[1][0], "answer": FAQS[1][1]})
+
+    # FAQ 1 moves away from its old embedding; FAQ 2 is deleted
+    FAQChangeFeed().apply(
+        [row(1, "How can I change my password?", "Use the reset link.", [0.0, 0.0, -1.0])],
+        [2],
+    )
+
+    assert len(answers) == 1
+    assert answers.get([0.0, -1.0, 0.0])["answer"] == "Unrelated"
+    assert len(indexes.responses._entries) == 0
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from app.services import similarity
+from app.services.config import settings
+from app.services.lexical import BM25Index, tokenize
+from app.services.similarity import similarity_service
+
+FAQS = [
+    (1, "How do I reset my password?"),
+    (2, "How do I delete my account?"),
+    (3, "Can I export my invoices as PDF?"),
+]
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.build(FAQS)
+    return index
+
+
+def test_tokenize_lowercases_and_splits_words():
+    assert tokenize("Export the PDF-invoices, please!") == [
+        "export",
+        "the",
+        "pdf",
+        "invoices",
+        "please",
+    ]
+
+
+def test_score_ranks_keyword_matches(index):
+    scores = index.score("export invoices pdf", [1, 2, 3])
+
+    assert scores[2] == max(scores)
+    assert scores[0] == scores[1] == 0.0
+    assert 0.0 < scores[2] <= 1.0
+    # Query terms unknown to the corpus lower the match
+    assert index.score("export invoices pdf zip", [3])[0] < scores[2]
+    assert index.score("", [1, 2, 3]) == [0.0, 0.0, 0.0]
+
+
+def test_upsert_and_remove_update_the_statistics(index):
+    index.upsert([(2, "How do I close my account?"), (4, "Do you ship abroad?")])
+    index.remove([1])
+
+    assert index.score("delete", [2]) == [0.0]
+    assert index.score("close account", [2])[0] > 0.0
+    assert index.score("ship abroad", [4])[0] > 0.0
+    assert index.score("reset password", [1]) == [0.0]
+    assert index.doc_freqs["how"] == 1
+    assert index.avg_doc_length == pytest.approx(
+        sum(index.doc_lengths.values()) / len(index.doc_lengths)
+    )
+
+
+def test_rerank_promotes_keyword_matches_without_demoting(index, monkeypatch):
+    monkeypatch.setattr(similarity, "lexical_index", index)
+    monkeypatch.setattr(settings, "LEXICAL_RERANK", True)
+    monkeypatch.setattr(settings, "LEXICAL_WEIGHT", 0.5)
+    candidates = [
+        {"id": 1, "similarity_score": 0.62},
+        {"id": 3, "similarity_score": 0.60},
+    ]
+
+    reranked = asyncio.run(
+        similarity_service.rerank("export invoices as pdf", candidates, db=None)
+    )
+
+    assert [c["id"] for c in reranked] == [3, 1]
+    assert reranked[0]["similarity_score"] > reranked[0]["vector_score"] == 0.60
+    # No keyword match: the vector score is kept
+    assert reranked[1]["similarity_score"] == reranked[1]["vector_score"] == 0.62
+    assert reranked[1]["lexical_score"] == 0.0
+
+
+def test_rerank_is_off_by_default(monkeypatch):
+    monkeypatch.setattr(settings, "LEXICAL_RERANK", False)
+    candidates = [{"id": 1, "similarity_score": 0.5}]
+
+    assert asyncio.run(similarity_service.rerank("anything", candidates, db=None)) == [
+        {"id": 1, "similarity_score": 0.5}
+    ]
+
+
+def test_score_with_an_empty_average_length():
+    index = BM25Index()
+    index.build([(1, "?!"), (2, "...")])
+    # As left by a partial update: a tokenized FAQ, but the average not recomputed
+    index._add(3, "reset password")
+
+    scores = index.score("reset password", [1, 2, 3])
+
+    assert scores[:2] == [0.0, 0.0]
+    assert 0.0 < scores[2] <= 1.0
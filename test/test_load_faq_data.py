@@ -0,0 +1,54 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from app import db as app_db
+from app.scripts import load_faq_data as loader
+
+
+def test_load_into_up_to_date_schema(tmp_path):
+    """
+    Needs a Postgres database with pgvector (POSTGRES_* settings); skipped otherwise.
+    """
+    tag = f"test-{uuid.uuid4().hex}"
+    path = tmp_path / "faqs.jsonl"
+    path.write_text(
+        "".join(
+            json.dumps({"question": f"{tag} question {i}?", "answer": f"Answer {i}."}) + "\n"
+            for i in range(5)
+        )
+        # A duplicate, skipped by the loader
+        + json.dumps({"question": f"{tag} question 0?", "answer": "Again."}) + "\n"
+    )
+
+    async def run():
+        try:
+            if not await app_db.ping_database(2):
+                pytest.skip("No database available")
+
+            # Bring the schema up to date, so the loader's own apply_schema has nothing to change
+            async with loader.SessionLocal() as db:
+                await app_db.apply_schema(db)
+
+            await loader.load_faq_data(str(path), batch_size=2)
+
+            async with loader.SessionLocal() as db:
+                count = (
+                    await db.execute(
+                        text("SELECT count(*) FROM faqs WHERE question LIKE :tag"),
+                        {"tag": f"{tag}%"},
+                    )
+                ).scalar_one()
+                await db.execute(
+                    text("DELETE FROM faqs WHERE question LIKE :tag"), {"tag": f"{tag}%"}
+                )
+                await db.commit()
+            return count
+        finally:
+            await loader.engine.dispose()
+            await app_db.engine.dispose()
+
+    assert asyncio.run(run()) == 5
@@ -0,0 +1,155 @@
+import asyncio
+from typing import Optional
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from app import main
+from app.main import app, load_indexes, retry_load_indexes
+from app.services.ask import ask_service
+from app.services.admission import RateLimiter
+from app.services.config import settings
+from app.services.query_log import query_log
+from app.services.similarity import similarity_service
+from app.utils.responses import FAQResponse
+from test.test_ask import set_up_fakes
+
+HEADERS = {"Authorization": "Bearer test"}
+
+
+def get(path: str, headers: Optional[dict] = None) -> httpx.Response:
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path, headers=headers)
+
+    return asyncio.run(run())
+
+
+def post(path: str, content: bytes, headers: dict = HEADERS) -> httpx.Response:
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, content=content, headers=headers)
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("path", ["/ask-question", "/ask-questions", "/ask-question/stream"])
+@pytest.mark.parametrize("body", [b"[1]", b'"x"', b"3", b"null", b"{not json"])
+def test_non_object_json_is_rejected(path, body):
+    response = post(path, body)
+
+    assert response.status_code == 400
+    assert "Invalid JSON payload." in response.text
+
+
+@pytest.mark.parametrize("path", ["/ask-question", "/ask-question/stream"])
+def test_non_string_question_is_rejected(path):
+    response = post(path, b'{"user_question": 42}')
+
+    assert response.status_code == 400
+    assert "No question provided." in response.text
+
+
+def stream_latency_count() -> float:
+    return REGISTRY.get_sample_value(
+        "askme_request_duration_seconds_count", {"endpoint": "ask-question-stream"}
+    ) or 0.0
+
+
+def test_stream_records_latency_once_sent(monkeypatch):
+    async def lookup(question):
+        return [0.0], {"source": "Local FAQ", "matched_question": "q", "answer": "a"}, []
+
+    monkeypatch.setattr(ask_service, "lookup", lookup)
+    before = stream_latency_count()
+
+    response = post("/ask-question/stream", b'{"user_question": "q"}')
+
+    assert response.status_code == 200
+    assert "event: answer" in response.text
+    assert stream_latency_count() == before + 1
+
+
+def test_stream_is_logged_once_answered_with_its_timings():
+    set_up_fakes(llm_latency=0.02)
+    query_log._queue = asyncio.Queue()
+    try:
+        response = post("/ask-question/stream", b'{"user_question": "Why is the sky blue?"}')
+        entries = [query_log._queue.get_nowait() for _ in range(query_log._queue.qsize())]
+    finally:
+        query_log._queue = None
+
+    assert "event: done" in response.text
+    assert len(entries) == 1
+    assert entries[0]["source"] == "OpenAI"
+    assert {"parse", "embedding", "llm"} <= set(entries[0]["timings"])
+
+
+def test_worker_stays_unready_until_the_index_loads(monkeypatch):
+    attempts = []
+
+    async def load_index(db):
+        attempts.append(db)
+        if len(attempts) < 3:
+            raise ConnectionRefusedError("database is down")
+
+    monkeypatch.setattr(similarity_service, "load_index", load_index)
+    monkeypatch.setattr(settings, "WARM_UP_RETRY_INTERVAL", 0.01)
+    monkeypatch.setattr(app.state, "ready", False)
+
+    async def run():
+        assert not await load_indexes(0.0)
+        assert not app.state.ready
+        await asyncio.wait_for(retry_load_indexes(0.0), timeout=1)
+
+    asyncio.run(run())
+
+    assert len(attempts) == 3
+    assert app.state.ready
+
+
+def test_rate_limited_requests_get_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(main, "rate_limiter", RateLimiter(per_minute=6, burst=2))
+
+    # Rejected bodies are still charged to the token
+    assert [post("/ask-question", b"{}").status_code for _ in range(2)] == [400, 400]
+    response = post("/ask-question", b"{}")
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "10"
+    assert "Too many requests." in response.text
+
+
+def test_main_page_answers_304_to_its_etag():
+    page = get("/")
+    etag = page.headers["etag"]
+
+    assert page.status_code == 200
+    assert etag.startswith('W/"')
+    assert get("/", {"If-None-Match": etag}).status_code == 304
+    assert get("/", {"If-None-Match": f'"other", {etag}'}).status_code == 304
+    assert get("/", {"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_local_faq_answer_is_sent_gzipped_once(monkeypatch):
+    answer = FAQResponse("How do I reset my password?", "Use the reset link. " * 100)
+
+    async def answer_question(question):
+        return answer
+
+    monkeypatch.setattr(ask_service, "answer", answer_question)
+
+    response = post(
+        "/ask-question",
+        b'{"user_question": "reset password"}',
+        {**HEADERS, "Accept-Encoding": "gzip"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == answer.etag[:-1] + '-gzip"'
+    # Decoded once by the client: the middleware didn't compress it again
+    assert response.json() == answer
@@ -0,0 +1,174 @@
+import asyncio
+import importlib.util
+from typing import List
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.services.config import settings
+from app.services.query_log import QueryLog
+from app.utils.metrics import start_request_timings, timed
+
+CANDIDATES = [
+    {"id": 4, "similarity_score": 0.91, "vector_score": 0.85},
+    {"id": 9, "similarity_score": 0.70},
+]
+
+
+def dropped() -> float:
+    return REGISTRY.get_sample_value("askme_query_log_dropped_total") or 0.0
+
+
+def capture_flushes(log: QueryLog) -> List[List[dict]]:
+    batches = []
+
+    async def flush(entries):
+        if entries:
+            batches.append(entries)
+
+    log._flush = flush
+    return batches
+
+
+def test_stop_writes_the_batch_being_collected():
+    log = QueryLog("postgres", batch_size=3, flush_interval=60)
+    batches = capture_flushes(log)
+
+    async def run():
+        log.start()
+        for i in range(7):
+            log.record(f"Question {i}?", [], "OpenAI")
+        # Two full batches are written; the last entry waits for the interval
+        await asyncio.sleep(0.05)
+        await log.stop()
+
+    asyncio.run(run())
+
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [entry["question"] for batch in batches for entry in batch] == [
+        f"Question {i}?" for i in range(7)
+    ]
+
+
+def test_record_captures_the_candidates_and_request_timings():
+    log = QueryLog("postgres", embeddings=True)
+
+    async def run():
+        log._queue = asyncio.Queue()
+        start_request_timings()
+        with timed("embedding"):
+            pass
+        log.record("Question?", CANDIDATES, "Local FAQ", [0.5, 0.5])
+        log.record("Other?", [], "OpenAI", [])
+        return log._queue.get_nowait(), log._queue.get_nowait()
+
+    entry, empty = asyncio.run(run())
+
+    assert entry["faq_id"] == 4
+    assert entry["candidate_ids"] == [4, 9]
+    assert entry["scores"] == [0.91, 0.70]
+    assert entry["vector_scores"] == [0.85, 0.70]
+    assert list(entry["timings"]) == ["embedding"]
+    assert entry["embedding"] == [0.5, 0.5]
+    assert entry["embedding_model"] == settings.EMBEDDING_SPACE
+    assert empty["faq_id"] is None
+    assert empty["embedding"] is None and empty["embedding_model"] is None
+
+
+def test_record_skips_embeddings_unless_enabled():
+    log = QueryLog("postgres")
+
+    async def run():
+        log._queue = asyncio.Queue()
+        log.record("Question?", CANDIDATES, "Local FAQ", [0.5, 0.5])
+        return log._queue.get_nowait()
+
+    entry = asyncio.run(run())
+
+    assert entry["embedding"] is None
+    assert entry["embedding_model"] is None
+
+
+def test_record_is_a_no_op_when_off():
+    log = QueryLog("off")
+    log.start()
+
+    log.record("Question?", CANDIDATES, "Local FAQ")
+
+    assert not log.enabled
+    assert log._queue is None
+
+
+def test_full_queue_drops_and_counts_entries():
+    log = QueryLog("postgres", queue_size=2)
+    before = dropped()
+
+    async def run():
+        log._queue = asyncio.Queue(log.queue_size)
+        for i in range(5):
+            log.record(f"Question {i}?", [], "OpenAI")
+        return log._queue.qsize()
+
+    assert asyncio.run(run()) == 2
+    assert dropped() == before + 3
+
+
+def test_full_batches_are_written_without_waiting():
+    log = QueryLog("postgres", batch_size=4, flush_interval=60)
+    batches = capture_flushes(log)
+
+    async def run():
+        log.start()
+        for i in range(8):
+            log.record(f"Question {i}?", [], "OpenAI")
+        await asyncio.sleep(0.05)
+        written = [len(batch) for batch in batches]
+        await log.stop()
+        return written
+
+    assert asyncio.run(run()) == [4, 4]
+
+
+def test_failed_writes_are_counted_as_dropped(monkeypatch):
+    log = QueryLog("postgres")
+    before = dropped()
+
+    async def fail(entries):
+        raise ConnectionRefusedError("database is down")
+
+    monkeypatch.setattr(log, "_write_postgres", fail)
+    asyncio.run(log._flush([{}, {}]))
+
+    assert dropped() == before + 2
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("pyarrow") is not None, reason="pyarrow is installed"
+)
+def test_parquet_log_fails_to_start_without_pyarrow(tmp_path):
+    log = QueryLog("parquet", path=str(tmp_path / "query_log"))
+
+    with pytest.raises(RuntimeError, match="pyarrow"):
+        log.start()
+
+
+def test_parquet_files_round_trip(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    from app.services.query_log import parquet_schema
+
+    log = QueryLog("parquet", path=str(tmp_path), embeddings=True)
+
+    async def run():
+        log._queue = asyncio.Queue()
+        start_request_timings()
+        log.record("Question?", CANDIDATES, "Local FAQ", [0.5, 0.5])
+        log._write_parquet(log._take(10))
+
+    asyncio.run(run())
+
+    files = list(tmp_path.glob("*.parquet"))
+    assert len(files) == 1
+    rows = pq.read_table(files[0], schema=parquet_schema()).to_pylist()
+    assert rows[0]["question"] == "Question?"
+    assert rows[0]["candidate_ids"] == [4, 9]
+    assert rows[0]["embedding"] == [0.5, 0.5]
@@ -0,0 +1,71 @@
+import gzip
+
+import orjson
+import pytest
+from starlette.requests import Request
+
+from app.services.config import settings
+from app.utils.responses import FAQResponse, etag_matches
+
+ETAG = 'W/"0123456789abcdef"'
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        'W/"0123456789abcdef"',
+        '"0123456789abcdef"',
+        '"other", W/"0123456789abcdef"',
+        ' W/"0123456789abcdef" ,"other"',
+        "*",
+    ],
+)
+def test_listed_etag_matches(header):
+    assert etag_matches(header, ETAG)
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        "",
+        '"other"',
+        # Substrings and tags containing the ETag are different tags
+        'W/"0123456789abcdef-gzip"',
+        '"x0123456789abcdef"',
+        "0123456789abcdef",
+    ],
+)
+def test_other_etags_do_not_match(header):
+    assert not etag_matches(header, ETAG)
+
+
+def request(accept_encoding: str = "") -> Request:
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []
+    return Request({"type": "http", "method": "POST", "headers": headers})
+
+
+def test_faq_response_is_gzipped_once_for_clients_that_accept_it():
+    answer = FAQResponse("How do I reset my password?", "Use the reset link. " * 100)
+
+    plain = answer.to_response(request())
+    zipped = answer.to_response(request("gzip, br"))
+
+    assert "content-encoding" not in plain.headers
+    assert orjson.loads(plain.body) == answer
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert orjson.loads(gzip.decompress(zipped.body)) == answer
+    # Each encoding is a different representation, with its own strong ETag
+    assert plain.headers["etag"] == answer.etag
+    assert zipped.headers["etag"] == answer.etag[:-1] + '-gzip"'
+    assert plain.headers["vary"] == zipped.headers["vary"] == "Accept-Encoding"
+    assert answer.to_response(request("gzip")).body is zipped.body
+
+
+def test_short_faq_response_is_sent_uncompressed():
+    answer = FAQResponse("Hi?", "Hello.")
+
+    response = answer.to_response(request("gzip"))
+
+    assert len(answer.body) < settings.GZIP_MINIMUM_SIZE
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == answer.etag
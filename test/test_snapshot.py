@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.services.snapshot import Snapshot, SnapshotError, SnapshotWriter
+
+
+def write_snapshot(path, rows: int = 10, dim: int = 8):
+    rng = np.random.default_rng(0)
+    with SnapshotWriter(path, "float32", "test-model") as writer:
+        writer.append(
+            list(range(1, rows + 1)),
+            [f"Question {i}?" for i in range(rows)],
+            [f"Answer {i}." for i in range(rows)],
+            rng.standard_normal((rows, dim)),
+        )
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "index.snapshot"
+    write_snapshot(path)
+
+    snapshot = Snapshot(path)
+    assert len(snapshot) == 10
+    assert snapshot.ids.tolist() == list(range(1, 11))
+    assert snapshot.questions[3] == "Question 3?"
+    assert snapshot.answers[-1] == "Answer 9."
+    assert np.allclose(np.linalg.norm(snapshot.matrix, axis=1), 1.0)
+
+
+@pytest.mark.parametrize("keep", [0.3, 0.6, 0.95])
+def test_truncated_snapshot_raises_snapshot_error(tmp_path, keep):
+    path = tmp_path / "index.snapshot"
+    write_snapshot(path)
+    os.truncate(path, int(path.stat().st_size * keep))
+
+    with pytest.raises(SnapshotError):
+        Snapshot(path)
+
+
+@pytest.mark.parametrize("model", ["", "text-embedding-3-small", "modèle-" * 40 + "@256"])
+def test_snapshot_keeps_the_whole_model_name(tmp_path, model):
+    path = tmp_path / "index.snapshot"
+    with SnapshotWriter(path, "float32", model) as writer:
+        writer.append([1], ["Question?"], ["Answer."], [[1.0, 0.0]])
+
+    assert Snapshot(path).embeddings_model == model
+
+
+def test_corrupt_model_name_raises_snapshot_error(tmp_path):
+    path = tmp_path / "index.snapshot"
+    write_snapshot(path)
+    # The model name is the last section: end it with a lone UTF-8 lead byte
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"\xc3")
+
+    with pytest.raises(SnapshotError):
+        Snapshot(path)
@@ -0,0 +1,24 @@
+import numpy as np
+
+from app.services.vector_index import InMemoryVectorIndex
+
+
+def test_empty_index_builds_searches_and_accepts_upserts():
+    index = InMemoryVectorIndex()
+    index.build([], [], [], [])
+
+    assert index.loaded
+    assert len(index) == 0
+    assert index.search([1.0, 0.0, 0.0], k=3) == []
+    assert index.search_batch([[1.0, 0.0, 0.0]], k=3) == [[]]
+
+    index.upsert([7], ["How do I reset my password?"], ["Use the reset link."], [[0.0, 2.0, 0.0]])
+
+    assert len(index) == 1
+    results = index.search([0.0, 1.0, 0.0], k=3)
+    assert [hit["id"] for hit in results] == [7]
+    assert np.isclose(results[0]["similarity_score"], 1.0)
+
+    index.compact()
+    assert index.ids.tolist() == [7]
+    assert [hit["id"] for hit in index.search([0.0, 1.0, 0.0], k=3)] == [7]